@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""
+Measures how quickly ``cls_for_resource`` resolves the Resource subclass for the ``self`` links found in a typical
+issue, against the legacy strategy of running every pattern in ``resource_class_map`` through ``re.search`` in turn.
+
+Run it from the root of the source tree::
+
+    $ python benchmarks/resource_dispatch.py
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from jira.resources import Resource, cls_for_resource, resource_class_map
+
+BASE_URL = 'http://localhost:2990/jira/rest/api/2/'
+LOOKUPS = 100000
+REPEAT = 5
+
+
+def issue_self_links(i):
+    # the links embedded in one issue with comments and worklogs
+    issue_url = BASE_URL + 'issue/{0}'.format(10000 + i)
+    return [
+        issue_url,
+        BASE_URL + 'status/1',
+        BASE_URL + 'priority/3',
+        BASE_URL + 'issuetype/1',
+        BASE_URL + 'project/BULK',
+        BASE_URL + 'user?username=fred',
+        BASE_URL + 'user?username=admin',
+        BASE_URL + 'component/10000',
+        BASE_URL + 'version/10000',
+        BASE_URL + 'resolution/1',
+        issue_url + '/votes',
+        issue_url + '/watchers',
+        issue_url + '/comment/{0}'.format(20000 + i),
+        issue_url + '/worklog/{0}'.format(30000 + i),
+    ]
+
+
+def legacy_cls_for_resource(resource_literal):
+    for resource in resource_class_map:
+        if re.search(resource, resource_literal):
+            return resource_class_map[resource]
+    else:
+        return Resource
+
+
+def timed(func, urls):
+    def run():
+        for url in urls:
+            func(url)
+    return min(timeit.repeat(run, number=1, repeat=REPEAT))
+
+
+def main():
+    urls = []
+    i = 0
+    while len(urls) < LOOKUPS:
+        urls.extend(issue_self_links(i))
+        i += 1
+    urls = urls[:LOOKUPS]
+
+    for url in urls[:len(issue_self_links(0))]:
+        assert cls_for_resource(url) is legacy_cls_for_resource(url), url
+
+    print 'Resolving {0} self links from {1} issues, best of {2}'.format(LOOKUPS, i, REPEAT)
+    print
+    legacy = timed(legacy_cls_for_resource, urls)
+    current = timed(cls_for_resource, urls)
+    print '{0:<12}{1:>10.4f}s{2:>10.2f}us per lookup'.format('legacy', legacy, legacy / LOOKUPS * 1e6)
+    print '{0:<12}{1:>10.4f}s{2:>10.2f}us per lookup'.format('current', current, current / LOOKUPS * 1e6)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+
+"""
+Measures the cost of turning a 1000-issue search response into Issue resources.
+
+The legacy strategy (one new ``PropertyHolder`` class per nested dict, every attribute built eagerly) is reproduced
+here as a baseline and compared against what ``jira.resources`` does today, with and without the ``identity_map``
+option. For each strategy the script reports the
+time taken, plus the number and size of the container objects (dicts, lists, instances, classes) left alive for the
+garbage collector to track, both right after construction and after fields have been read.
+
+Run it from the root of the source tree::
+
+    $ python benchmarks/resource_parsing.py
+"""
+import gc
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from jira.resources import IdentityMap, Issue, PropertyHolder, Resource, cls_for_resource
+
+BASE_URL = 'http://localhost:2990/jira/rest/api/2/'
+OPTIONS = {
+    'server': 'http://localhost:2990/jira',
+    'rest_path': 'api',
+    'rest_api_version': '2',
+}
+SHARED_OPTIONS = dict(OPTIONS, identity_map=IdentityMap())
+ISSUE_COUNT = 1000
+REPEAT = 5
+
+
+def user(name):
+    return {
+        'self': BASE_URL + 'user?username=' + name,
+        'name': name,
+        'emailAddress': name + '@example.com',
+        'displayName': name.title(),
+        'active': True,
+        'avatarUrls': {
+            '16x16': 'http://localhost:2990/jira/secure/useravatar?size=small&avatarId=10062',
+            '48x48': 'http://localhost:2990/jira/secure/useravatar?avatarId=10062',
+        },
+    }
+
+
+def issue(i):
+    issue_url = BASE_URL + 'issue/{0}'.format(10000 + i)
+    return {
+        'expand': 'editmeta,renderedFields,transitions,changelog,operations',
+        'id': str(10000 + i),
+        'self': issue_url,
+        'key': 'BULK-{0}'.format(i),
+        'fields': {
+            'summary': 'Generated issue {0}'.format(i),
+            'description': 'A reasonably long description for issue {0}. '.format(i) * 4,
+            'created': '2012-08-06T10:14:55.000+0000',
+            'updated': '2012-08-07T11:20:01.000+0000',
+            'labels': ['bulk', 'generated'],
+            'status': {'self': BASE_URL + 'status/1', 'id': '1', 'name': 'Open',
+                       'iconUrl': 'http://localhost:2990/jira/images/icons/status_open.gif'},
+            'priority': {'self': BASE_URL + 'priority/3', 'id': '3', 'name': 'Major',
+                         'iconUrl': 'http://localhost:2990/jira/images/icons/priority_major.gif'},
+            'issuetype': {'self': BASE_URL + 'issuetype/1', 'id': '1', 'name': 'Bug', 'subtask': False},
+            'project': {'self': BASE_URL + 'project/BULK', 'id': '10001', 'key': 'BULK', 'name': 'Bulk Project'},
+            'assignee': user('fred'),
+            'reporter': user('admin'),
+            'components': [{'self': BASE_URL + 'component/10000', 'id': '10000', 'name': 'Backend'}],
+            'fixVersions': [{'self': BASE_URL + 'version/10000', 'id': '10000', 'name': '2.0', 'released': False}],
+            'progress': {'progress': 0, 'total': 0},
+            'aggregateprogress': {'progress': 0, 'total': 0},
+            'votes': {'self': issue_url + '/votes', 'votes': 0, 'hasVoted': False},
+            'watches': {'self': issue_url + '/watchers', 'watchCount': 1, 'isWatching': False},
+            'comment': {
+                'startAt': 0,
+                'maxResults': 2,
+                'total': 2,
+                'comments': [{
+                    'self': issue_url + '/comment/{0}'.format(10000 + c),
+                    'id': str(10000 + c),
+                    'author': user('fred'),
+                    'body': 'Comment {0} on issue {1}'.format(c, i),
+                    'created': '2012-08-06T10:14:55.000+0000',
+                    'visibility': {'type': 'role', 'value': 'Developers'},
+                } for c in range(2)],
+            },
+        },
+    }
+
+
+def search_payload(count=ISSUE_COUNT):
+    return json.dumps({
+        'startAt': 0,
+        'maxResults': count,
+        'total': count,
+        'issues': [issue(i) for i in range(count)],
+    })
+
+
+def legacy_dict2resource(raw, top=None, options=None, session=None):
+    # the pre-lazy implementation: a brand new class for every nested dict without a self link
+    if top is None:
+        top = type('PropertyHolder', (object,), raw)
+
+    seqs = tuple, list, set, frozenset
+    for i, j in raw.iteritems():
+        if isinstance(j, dict):
+            if 'self' in j:
+                resource = legacy_resource(j, options, session)
+                setattr(top, i, resource)
+            else:
+                setattr(top, i, legacy_dict2resource(j, options=options, session=session))
+        elif isinstance(j, seqs):
+            seq_list = []
+            for seq_elem in j:
+                if isinstance(seq_elem, dict):
+                    if 'self' in seq_elem:
+                        seq_list.append(legacy_resource(seq_elem, options, session))
+                    else:
+                        seq_list.append(legacy_dict2resource(seq_elem, options=options, session=session))
+                else:
+                    seq_list.append(seq_elem)
+            setattr(top, i, seq_list)
+        else:
+            setattr(top, i, j)
+    return top
+
+
+def legacy_resource(raw, options, session):
+    resource = Resource.__new__(cls_for_resource(raw['self']))
+    Resource.__init__(resource, 'legacy/{0}', options, session)
+    resource.raw = raw
+    legacy_dict2resource(raw, resource, options, session)
+    return resource
+
+
+def parse_legacy(payload):
+    return [legacy_resource(raw, OPTIONS, None) for raw in json.loads(payload)['issues']]
+
+
+def parse_current(payload):
+    return [Issue(OPTIONS, None, raw) for raw in json.loads(payload)['issues']]
+
+
+def parse_shared(payload):
+    hook = SHARED_OPTIONS['identity_map'].object_hook()
+    return [Issue(SHARED_OPTIONS, None, raw) for raw in json.loads(payload, object_hook=hook)['issues']]
+
+
+def touch_common(issues):
+    for issue in issues:
+        issue.key
+        issue.fields.status.name
+
+
+def touch_all(value):
+    if isinstance(value, (Resource, PropertyHolder)):
+        raw = value.raw if isinstance(value, Resource) else value._raw
+        for item in raw:
+            touch_all(getattr(value, item))
+    elif isinstance(value, list):
+        for elem in value:
+            touch_all(elem)
+    elif isinstance(value, type):
+        # legacy property holders are classes
+        for item in dir(value):
+            if not item.startswith('__'):
+                touch_all(getattr(value, item))
+
+
+def tracked_objects(func, payload, touch):
+    gc.collect()
+    before = set(id(obj) for obj in gc.get_objects())
+    issues = func(payload)
+    touch(issues)
+    gc.collect()
+    created = [obj for obj in gc.get_objects() if id(obj) not in before]
+    del issues
+    return len(created), sum(sys.getsizeof(obj) for obj in created) / 1024
+
+
+def timed(func, payload, touch):
+    def run():
+        touch(func(payload))
+    return min(timeit.repeat(run, number=1, repeat=REPEAT))
+
+
+def main():
+    payload = search_payload()
+    print 'Parsing a {0}-issue search response ({1} KB), best of {2}'.format(ISSUE_COUNT, len(payload) / 1024, REPEAT)
+    print
+    print '{0:<52}{1:>10}{2:>18}{3:>14}'.format('scenario', 'seconds', 'tracked objects', 'tracked KB')
+    scenarios = [
+        ('construct only', lambda issues: None),
+        ('construct, read key and status', touch_common),
+        ('construct, read every field', lambda issues: [touch_all(issue) for issue in issues]),
+    ]
+    for name, touch in scenarios:
+        for label, func in (('legacy', parse_legacy), ('current', parse_current), ('identity map', parse_shared)):
+            count, size = tracked_objects(func, payload, touch)
+            print '{0:<52}{1:>10.4f}{2:>18}{3:>14}'.format('{0} ({1})'.format(name, label),
+                                                          timed(func, payload, touch), count, size)
+
+
+if __name__ == '__main__':
+    main()
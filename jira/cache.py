@@ -0,0 +1,392 @@
+"""
+This module implements the caches a :py:class:`jira.client.JIRA` client can keep the responses of slow-changing
+metadata endpoints in, such as the lists of fields, priorities and statuses. Pass one as the ``cache`` option of the
+client to turn caching on.
+
+A cache is any object with the ``get``, ``set`` and ``invalidate`` methods of :py:class:`MemoryCache`. Keys are
+strings and values are parsed JSON.
+
+It also implements two wrappers for the client's HTTP session: :py:class:`CachingSession`, the HTTP cache behind the
+``http_cache`` option, which revalidates ``GET`` responses with the server instead of downloading and parsing them
+again, and :py:class:`CoalescingSession`, behind the ``coalesce_requests`` option, which lets identical ``GET``
+requests made at the same time share one trip to the server.
+"""
+from collections import OrderedDict
+from copy import deepcopy
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from threading import Event, Lock
+import time
+
+# seconds to keep the response of each cacheable endpoint, keyed by its path under the REST API
+DEFAULT_TTLS = {
+    'field': 3600,
+    'priority': 3600,
+    'status': 3600,
+    'resolution': 3600,
+    'issuetype': 3600,
+    'issueLinkType': 3600,
+    'issue/createmeta': 3600,
+    'serverInfo': 300,
+}
+
+
+class MemoryCache(object):
+    """
+    Keeps up to ``maxsize`` responses in memory, dropping the least recently used one when full and any that have
+    outlived their time to live. Values are copied going in and coming out, so changing a returned value never changes
+    what later callers get. Safe to share between threads and clients.
+
+    :param maxsize: the largest number of responses to keep
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """
+        Get the value cached for a key, or ``None`` if there is none or it has expired.
+
+        :param key: the key to look up
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                return None
+            # re-inserting makes this the most recently used entry
+            self._entries[key] = entry
+            return deepcopy(value)
+
+    def set(self, key, value, ttl):
+        """
+        Cache a value for a key.
+
+        :param key: the key to cache the value under
+        :param value: the parsed JSON to cache
+        :param ttl: number of seconds until the value expires
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + ttl, deepcopy(value))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, prefix=''):
+        """
+        Drop every cached value whose key starts with ``prefix``; all of them by default.
+
+        :param prefix: the start of the keys to drop
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+
+class FileCache(object):
+    """
+    Keeps responses as JSON files in a directory, so they outlive the process and can be shared by every script run
+    on the machine. Each file is written to a temporary name and then renamed into place, so readers never see one
+    half written.
+
+    :param path: the directory to keep the files in, created if it doesn't exist
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def get(self, key):
+        """
+        Get the value cached for a key, or ``None`` if there is none or it has expired.
+
+        :param key: the key to look up
+        """
+        entry = self._read(self._file_path(key))
+        if entry is None or entry['key'] != key or entry['expires'] < time.time():
+            return None
+        return entry['value']
+
+    def set(self, key, value, ttl):
+        """
+        Cache a value for a key.
+
+        :param key: the key to cache the value under
+        :param value: the parsed JSON to cache
+        :param ttl: number of seconds until the value expires
+        """
+        handle, temp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(handle, 'w') as temp_file:
+            json.dump({'key': key, 'expires': time.time() + ttl, 'value': value}, temp_file)
+        replace_file(temp_path, self._file_path(key))
+
+    def invalidate(self, prefix=''):
+        """
+        Drop every cached value whose key starts with ``prefix``; all of them by default.
+
+        :param prefix: the start of the keys to drop
+        """
+        for name in os.listdir(self.path):
+            if not name.endswith('.json'):
+                continue
+            file_path = os.path.join(self.path, name)
+            entry = self._read(file_path)
+            if entry is None or entry['key'].startswith(prefix):
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
+
+    def _file_path(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _read(self, file_path):
+        try:
+            with open(file_path, 'r') as cache_file:
+                return json.load(cache_file)
+        except (IOError, ValueError):
+            return None
+
+
+class CachingSession(object):
+    """
+    Wraps a requests session to make its ``GET`` requests conditional. The last successful response for each URL
+    and set of query parameters is kept, along with its ``ETag`` and ``Last-Modified`` validators, and the next
+    request for it carries ``If-None-Match`` and ``If-Modified-Since`` headers. When the server answers ``304 Not
+    Modified``, the kept response is returned instead, and :py:func:`parsed_json` returns a copy of the JSON already
+    parsed from it.
+
+    ``Cache-Control`` on the response is honoured: ``no-store`` responses are never kept, ``max-age`` ones are
+    returned without asking the server again until they expire, and ``no-cache`` ones are always revalidated.
+    Responses that ``Vary`` on a request header are only reused for requests with the same value for it. Every other
+    attribute and method is the wrapped session's.
+
+    :param session: the requests session to wrap
+    :param maxsize: the largest number of responses to keep; the least recently used is dropped first
+    """
+
+    def __init__(self, session, maxsize=1000):
+        self._session = session
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __getattr__(self, item):
+        return getattr(self._session, item)
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        key = url + ' ' + json.dumps(params, sort_keys=True)
+        headers = dict(headers or {})
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                # re-inserting makes this the most recently used entry
+                self._entries[key] = entry
+        if entry is not None and not self._matches_vary(entry, headers):
+            entry = None
+
+        if entry is not None:
+            if entry['expires'] > time.time():
+                return entry['response']
+            if entry['etag'] is not None:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified'] is not None:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        r = self._session.get(url, params=params, headers=headers, **kwargs)
+        if r.status_code == 304 and entry is not None:
+            entry['expires'] = time.time() + max_age(r.headers.get('cache-control'))
+            return entry['response']
+
+        self._store(key, headers, r)
+        return r
+
+    def invalidate(self):
+        """
+        Drop every kept response.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key, headers, r):
+        cache_control = (r.headers.get('cache-control') or '').lower()
+        vary = [name.strip().lower() for name in (r.headers.get('vary') or '').split(',') if name.strip()]
+        etag = r.headers.get('etag')
+        last_modified = r.headers.get('last-modified')
+        expires = time.time() + max_age(cache_control)
+        if r.status_code != 200 or 'no-store' in cache_control or '*' in vary:
+            storable = False
+        else:
+            storable = etag is not None or last_modified is not None or expires > time.time()
+
+        with self._lock:
+            self._entries.pop(key, None)
+            if not storable:
+                return
+            # kept responses are returned to later callers, so each needs its own copy of the JSON
+            r._shared_json = True
+            self._entries[key] = {
+                'response': r,
+                'etag': etag,
+                'last_modified': last_modified,
+                'expires': expires,
+                'vary': dict((name, self._request_header(headers, name)) for name in vary),
+            }
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _matches_vary(self, entry, headers):
+        return all(self._request_header(headers, name) == value for name, value in entry['vary'].iteritems())
+
+    def _request_header(self, headers, name):
+        # the value the request is sent with, whether it was passed in or is one of the session's defaults
+        for source in (headers, getattr(self._session, 'headers', None) or {}):
+            for header, value in source.iteritems():
+                if header.lower() == name:
+                    return value
+        return None
+
+
+class CoalescingSession(object):
+    """
+    Wraps a requests session so that identical ``GET`` requests made while one is already in flight wait for it and
+    share its response instead of going to the server themselves. The response is marked as shared, so
+    :py:func:`parsed_json` only parses it once but gives each thread its own copy of the JSON. Requests are identical
+    when they have the same URL, query parameters, headers and other arguments; the session belongs to one client, so
+    they are always made as the same user. An error raised by the request is raised in every thread that waited for
+    it. Every other attribute and method is the wrapped session's.
+
+    :param session: the requests session to wrap
+    """
+
+    def __init__(self, session):
+        self._session = session
+        self._in_flight = {}
+        self._lock = Lock()
+
+    def __getattr__(self, item):
+        return getattr(self._session, item)
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        key = json.dumps([url, params, headers, kwargs], sort_keys=True, default=repr)
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = InFlightRequest()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error[0], call.error[1], call.error[2]
+            return call.response
+
+        try:
+            call.response = self._session.get(url, params=params, headers=headers, **kwargs)
+        except:
+            call.error = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            try:
+                if call.waiters and call.response is not None:
+                    call.response._shared_json = True
+            finally:
+                # waiting threads must always be released
+                call.done.set()
+        return call.response
+
+
+class InFlightRequest(object):
+    """
+    A request a :py:class:`CoalescingSession` has sent and other threads may be waiting on.
+    """
+
+    def __init__(self):
+        self.done = Event()
+        self.response = None
+        self.error = None
+        self.waiters = 0
+
+
+def max_age(cache_control):
+    """
+    Get the number of seconds a ``Cache-Control`` header lets a response be reused for without revalidating it; 0
+    when it sets no ``max-age`` or sets ``no-cache``.
+    """
+    if not cache_control:
+        return 0
+    directives = [directive.strip().lower() for directive in cache_control.split(',')]
+    if 'no-cache' in directives:
+        return 0
+    for directive in directives:
+        if directive.startswith('max-age='):
+            try:
+                return int(directive[len('max-age='):])
+            except ValueError:
+                return 0
+    return 0
+
+
+def replace_file(source, target):
+    """
+    Move a file to a new path, replacing any file already there. :py:func:`os.rename` does so atomically on POSIX
+    systems, but on Windows it refuses to replace an existing file, so there the old file is removed first.
+
+    :param source: path of the file to move
+    :param target: path to move it to
+    """
+    try:
+        os.rename(source, target)
+    except OSError:
+        if not os.path.exists(target):
+            raise
+        try:
+            os.remove(target)
+        except OSError:
+            pass
+        os.rename(source, target)
+
+
+def parsed_json(r, object_hook=None):
+    """
+    Parse the JSON body of a response, remembering the result on the response, so a response that a
+    :py:class:`CachingSession` returns again is only ever parsed once. Responses that may be handed to more than one
+    caller are marked as shared by the session wrappers, and every call for one of those returns its own copy of the
+    JSON (see :py:func:`copy_json`), so callers are free to change what they get.
+
+    :param r: the response to parse
+    :param object_hook: a function to pass each parsed JSON object through, as for :py:func:`json.loads`
+    """
+    try:
+        r_json = r._parsed_json
+    except AttributeError:
+        r_json = r._parsed_json = json.loads(r.text, object_hook=object_hook)
+    if getattr(r, '_shared_json', False):
+        return copy_json(r_json)
+    return r_json
+
+
+def copy_json(value):
+    """
+    Copy parsed JSON. Every dict and list in it is copied, while strings and numbers, which can't be changed, are
+    shared; this takes about a third of the time of :py:func:`copy.deepcopy`, and less than parsing the JSON again.
+
+    :param value: the parsed JSON to copy
+    """
+    if type(value) is dict:
+        return {key: copy_json(elem) if type(elem) in (dict, list) else elem for key, elem in value.iteritems()}
+    if type(value) is list:
+        return [copy_json(elem) if type(elem) in (dict, list) else elem for elem in value]
+    return value
@@ -0,0 +1,177 @@
+"""
+This module implements a change feed over JIRA searches: a poller that remembers how far it has read through the
+issues matching a JQL search, ordered by their ``updated`` timestamps, and on each poll returns only the issues that
+changed since the last one.
+"""
+from datetime import datetime, timedelta
+import json
+import os
+
+from jira.cache import replace_file
+from jira.client import restrict_jql, order_by_position
+from jira.resources import Issue
+
+WATERMARK_FORMAT = '%Y-%m-%dT%H:%M'
+JQL_DATE_FORMAT = '%Y/%m/%d %H:%M'
+
+
+class ChangeFeed(object):
+    """
+    Polls a JIRA search for the issues that changed since the previous poll.
+
+    JQL only compares ``updated`` to the minute, so each poll searches from a minute (or ``overlap`` minutes) before
+    the newest change already seen, and drops issues it has already returned with the same ``id`` and ``updated``
+    values. The cost of a poll therefore follows the number of changes, not the time since the feed was created.
+
+    Pages are read by seeking rather than by offset: each page searches again from the minute of the last change on
+    the one before. An issue that changes during a poll moves to the end of the results, which would shift the
+    issues after it back across a page boundary and skip one; seeking keeps them all in view, and the moved issue is
+    returned again with its new ``updated`` value.
+
+    The watermark is the local time part of the newest ``updated`` value seen. JIRA renders those values, and reads
+    the dates in JQL, in the timezone of the user the client logs in as, so the watermark can be compared to JQL
+    dates directly. A feed should always be polled with the same user.
+
+    :param jira: the :py:class:`jira.client.JIRA` client to search with
+    :param jql_str: the JQL search string selecting the issues to follow; an empty string follows every issue
+    :param statePath: path of a JSON file to keep the watermark in between runs; it is read if it exists and
+        written after every poll
+    :param since: a :py:class:`datetime.datetime` in the user's timezone to start from when there is no saved state;
+        without one, the first poll returns every matching issue
+    :param overlap: number of minutes before the watermark to search from
+    :param pageSize: number of issues to request from the server per page
+    :param fields: comma-separated string of issue fields to include in the results; ``updated`` is always added
+    :param expand: extra information to fetch inside each resource
+    """
+
+    def __init__(self, jira, jql_str='', statePath=None, since=None, overlap=1, pageSize=100, fields=None,
+                 expand=None):
+        if order_by_position(jql_str) is not None:
+            raise ValueError('change feeds order by the updated field; remove the ORDER BY clause from the JQL')
+        if overlap < 1:
+            raise ValueError('the overlap must be at least one minute to cover the granularity of JQL dates')
+        self._jira = jira
+        self.jql_str = jql_str
+        self.statePath = statePath
+        self.overlap = overlap
+        self.pageSize = pageSize
+        self.fields = fields
+        self.expand = expand
+
+        self.watermark = None
+        self.seen = {}
+        if since is not None:
+            self.watermark = since.strftime(WATERMARK_FORMAT)
+        if statePath is not None and os.path.exists(statePath):
+            self.load()
+
+    def poll(self, raw=None):
+        """
+        Get a generator of the issues that changed since the last poll, oldest change first. The watermark moves
+        forward as issues are consumed, and the state is saved once the generator is exhausted or closed, so
+        stopping early only leaves the remaining changes for the next poll.
+
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
+        """
+        if raw is None:
+            raw = self._jira._options['raw']
+
+        try:
+            for raw_issue_json in self._changes():
+                issue_id = raw_issue_json['id']
+                updated = raw_issue_json['fields']['updated']
+                if self.seen.get(issue_id) == updated:
+                    continue
+
+                self.seen[issue_id] = updated
+                if self.watermark is None or local_time(updated) > self.watermark:
+                    self.watermark = local_time(updated)
+                if raw:
+                    yield raw_issue_json
+                else:
+                    yield Issue(self._jira._options, self._jira._session, raw_issue_json)
+        finally:
+            self._prune()
+            if self.statePath is not None:
+                self.save()
+
+    def load(self):
+        """
+        Read the watermark and the recently seen issues from the state file.
+        """
+        with open(self.statePath, 'r') as state_file:
+            state = json.load(state_file)
+        self.watermark = state['watermark']
+        self.seen = state['seen']
+
+    def save(self):
+        """
+        Write the watermark and the recently seen issues to the state file. The file is written under a temporary name
+        and then moved into place, so a crash while saving leaves the previous state intact (on POSIX systems, where
+        the move is atomic).
+        """
+        temp_path = self.statePath + '.tmp'
+        with open(temp_path, 'w') as state_file:
+            json.dump({'watermark': self.watermark, 'seen': self.seen}, state_file)
+        replace_file(temp_path, self.statePath)
+
+    def _lower_bound(self):
+        return datetime.strptime(self.watermark, WATERMARK_FORMAT) - timedelta(minutes=self.overlap)
+
+    def _changes(self):
+        since = None if self.watermark is None else self._lower_bound()
+        while True:
+            resource = self._jira._search(self._search_jql(since), 0, self.pageSize, self._fields(), self.expand)
+            raw_issues = resource['issues']
+            for raw_issue_json in raw_issues:
+                yield raw_issue_json
+            if len(raw_issues) >= resource['total']:
+                return
+
+            last = datetime.strptime(local_time(raw_issues[-1]['fields']['updated']), WATERMARK_FORMAT)
+            if since is None or last > since:
+                since = last
+                continue
+
+            # a whole page changed within one minute, which JQL can't seek into; read the rest of it by issue ID
+            for raw_issue_json in self._jira.iter_issues(self._minute_jql(since), pageSize=self.pageSize,
+                                                         fields=self._fields(), expand=self.expand, keyset=True,
+                                                         raw=True):
+                yield raw_issue_json
+            since += timedelta(minutes=1)
+
+    def _search_jql(self, since=None):
+        if since is None:
+            jql_str = self.jql_str.strip()
+        else:
+            jql_str = restrict_jql(self.jql_str, 'updated >= "{0}"'.format(since.strftime(JQL_DATE_FORMAT)))
+        return (jql_str + ' ORDER BY updated ASC').strip()
+
+    def _minute_jql(self, minute):
+        return restrict_jql(self.jql_str, 'updated >= "{0}" AND updated < "{1}"'.format(
+            minute.strftime(JQL_DATE_FORMAT), (minute + timedelta(minutes=1)).strftime(JQL_DATE_FORMAT)))
+
+    def _fields(self):
+        # the feed needs the updated field to keep track of what it has seen
+        if self.fields is None:
+            return None
+        fields = self.fields.split(',') if isinstance(self.fields, basestring) else list(self.fields)
+        if 'updated' not in fields:
+            fields.append('updated')
+        return ','.join(fields)
+
+    def _prune(self):
+        # only issues the next poll's search can return again need remembering
+        if self.watermark is None:
+            return
+        lower_bound = self._lower_bound().strftime(WATERMARK_FORMAT)
+        self.seen = dict((issue_id, updated) for issue_id, updated in self.seen.iteritems()
+                         if local_time(updated) >= lower_bound)
+
+
+def local_time(timestamp):
+    """
+    Strip the seconds, fractions of a second and the UTC offset from an ISO 8601 timestamp rendered by JIRA, e.g.
+    ``2012-08-07T11:20:01.000+1000`` becomes ``2012-08-07T11:20``.
+    """
+    return timestamp[:len('yyyy-mm-ddThh:mm')]
@@ -3,13 +3,20 @@ This module implements a friendly (well, friendlier) interface between the raw J
 responses from JIRA and the Resource/dict abstractions provided by this library. Users
 will construct a JIRA object as described below.
 """
+from collections import deque
 from functools import wraps
+import hashlib
+from itertools import islice
+from multiprocessing.pool import ThreadPool
+import re
+import time
 
 import requests
 from .packages.requests_oauth.hook import OAuthHook
 import json
-from jira.exceptions import raise_on_error
-from jira.resources import Resource, Issue, Comment, Project, Attachment, Component, Dashboard, Filter, Votes, Watchers, Worklog, IssueLink, IssueLinkType, IssueType, Priority, Version, Role, Resolution, SecurityLevel, Status, User, CustomFieldOption, RemoteLink
+from jira.cache import DEFAULT_TTLS, CachingSession, CoalescingSession, parsed_json
+from jira.exceptions import JIRAError, raise_on_error
+from jira.resources import Resource, Issue, Comment, Project, Attachment, Component, Dashboard, Filter, Votes, Watchers, Worklog, IssueLink, IssueLinkType, IssueType, Priority, Version, Role, Resolution, SecurityLevel, Status, User, CustomFieldOption, RemoteLink, IdentityMap, json_object_hook, reload_policy
 
 
 def translate_resource_args(func):
@@ -29,6 +36,178 @@ def translate_resource_args(func):
     return wrapper
 
 
+# quoted values, which are skipped over, or the start of an ORDER BY clause
+ORDER_BY_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|(?P<order_by>\border\s+by\b)', re.IGNORECASE)
+
+
+def order_by_position(jql_str):
+    """
+    Find where the ``ORDER BY`` clause of a JQL search string starts, or ``None`` if it has none. The words ``order
+    by`` inside quoted values don't count.
+    """
+    for match in ORDER_BY_PATTERN.finditer(jql_str):
+        if match.group('order_by'):
+            return match.start()
+    return None
+
+
+def keyset_jql(jql_str, last_id=None, descending=False):
+    """
+    Rewrite a JQL search string to order its results by issue ID, restricted to the issues after ``last_id``.
+
+    :param descending: whether to order the results from the highest ID down, and restrict them to the issues
+        before ``last_id``
+    """
+    clauses = []
+    if jql_str.strip():
+        clauses.append('({0})'.format(jql_str))
+    if last_id is not None:
+        clauses.append('id {0} {1}'.format('<' if descending else '>', last_id))
+    return (' AND '.join(clauses) + ' ORDER BY id ' + ('DESC' if descending else 'ASC')).strip()
+
+
+def restrict_jql(jql_str, clause):
+    """
+    Combine a JQL search string with an extra clause that its results must also match. Any ``ORDER BY`` in the
+    search string is dropped.
+    """
+    position = order_by_position(jql_str)
+    if position is not None:
+        jql_str = jql_str[:position]
+    if not jql_str.strip():
+        return clause
+    return '({0}) AND {1}'.format(jql_str.strip(), clause)
+
+
+def jql_string(value):
+    """
+    Quote a value as a JQL string, escaping the backslashes and double quotes in it.
+    """
+    return '"{0}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def key_chunks(keys, chunkSize):
+    """
+    Split issue keys into ``key in (...)`` JQL clauses of at most ``chunkSize`` keys. Yields a tuple of the keys in
+    each chunk and the JQL clause selecting them.
+    """
+    for i in xrange(0, len(keys), chunkSize):
+        chunk = tuple(keys[i:i + chunkSize])
+        yield chunk, 'key in ({0})'.format(', '.join(jql_string(key) for key in chunk))
+
+
+def bounded_imap(func, iterable, workers):
+    """
+    Lazily apply ``func`` to each item of ``iterable`` on a pool of ``workers`` threads, yielding the results in input
+    order. At most ``workers`` calls are in flight at once, so results are never computed far ahead of the consumer.
+    """
+    pool = ThreadPool(workers)
+    try:
+        args = iter(iterable)
+        pending = deque(pool.apply_async(func, (arg,)) for arg in islice(args, workers))
+        while pending:
+            result = pending.popleft().get()
+            for arg in islice(args, 1):
+                pending.append(pool.apply_async(func, (arg,)))
+            yield result
+    finally:
+        pool.terminate()
+
+
+class AdaptivePageSize(object):
+    """
+    Chooses the page size of each request in a paged search so that pages take about ``targetLatency`` seconds and
+    hold about ``targetBytes`` bytes of JSON, starting from ``pageSize``. After every page the cost per issue is
+    measured and the next size is scaled toward whichever target is tighter, at most doubling or halving at a time.
+
+    The server silently caps ``maxResults`` at its own limit and reports the value it actually used, so the page size
+    never grows past a cap the server has reported.
+    """
+
+    def __init__(self, pageSize, targetLatency=None, targetBytes=None, maxPageSize=1000):
+        self.pageSize = max(1, min(pageSize, maxPageSize))
+        self.targetLatency = targetLatency
+        self.targetBytes = targetBytes
+        self.maxPageSize = maxPageSize
+        self._response_bytes = None
+
+    def response_received(self, r):
+        self._response_bytes = len(r.content)
+
+    def page_received(self, resource, elapsed):
+        served = resource.get('maxResults')
+        if served is not None and 0 < served < self.pageSize:
+            self.maxPageSize = served
+
+        received = len(resource['issues'])
+        if received:
+            candidates = []
+            if self.targetLatency is not None and elapsed > 0:
+                candidates.append(self.targetLatency * received / elapsed)
+            if self.targetBytes is not None and self._response_bytes:
+                candidates.append(float(self.targetBytes) * received / self._response_bytes)
+            if candidates:
+                size = int(min(candidates))
+                self.pageSize = max(self.pageSize // 2, min(size, self.pageSize * 2))
+
+        self.pageSize = max(1, min(self.pageSize, self.maxPageSize))
+        self._response_bytes = None
+
+
+class JIRAExecutor(object):
+    """
+    Runs calls to the methods of a :py:class:`JIRA` client on a bounded pool of threads.
+
+    Every call goes through the same client, and so through its single HTTP session and connection pool, while the
+    number of threads caps how many requests are in flight at once. Get one from :py:meth:`JIRA.executor`.
+    """
+
+    def __init__(self, jira, max_workers):
+        self._jira = jira
+        self._pool = ThreadPool(max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def submit(self, method, *args, **kwargs):
+        """
+        Schedule a call and return a future for its result. The future is a
+        :py:class:`multiprocessing.pool.AsyncResult`: its ``get()`` method waits for the call to finish and returns
+        its value, or raises the exception the call raised.
+
+        :param method: the name of a method of the client, such as ``'comments'``, or any callable
+        :param args: positional arguments for the call
+        :param kwargs: keyword arguments for the call
+        """
+        if isinstance(method, basestring):
+            method = getattr(self._jira, method)
+        return self._pool.apply_async(method, args, kwargs)
+
+    def map(self, method, iterable):
+        """
+        Call a method once with each item of ``iterable`` as its argument. Every call is scheduled immediately; the
+        results are returned as a generator in the same order as the items.
+
+        :param method: the name of a method of the client, such as ``'comments'``, or any callable
+        :param iterable: the arguments to call the method with
+        """
+        futures = [self.submit(method, arg) for arg in iterable]
+        return (future.get() for future in futures)
+
+    def shutdown(self, wait=True):
+        """
+        Stop accepting calls and release the threads once the calls already scheduled have finished.
+
+        :param wait: whether to block until the scheduled calls are done
+        """
+        self._pool.close()
+        if wait:
+            self._pool.join()
+
+
 class JIRA(object):
     """
     User interface to JIRA.
@@ -39,12 +218,30 @@ class JIRA(object):
     of the form ``issue.fields.summary`` will be resolved into the proper lookups to return the JSON value at that
     mapping. Methods that do not return resources will return a dict constructed from the JSON response or a scalar
     value; see each method's documentation for details on what that method returns.
+
+    A client can be shared between threads. Its options are copied when it is constructed and never change afterwards,
+    its URLs are built without touching any shared state, and all requests go through one HTTP session whose
+    connection pool is safe for concurrent use. The Resources it returns may be read from several threads too, but
+    a Resource must not be updated, deleted or reloaded by one thread while another is using it.
     """
 
     DEFAULT_OPTIONS = {
         "server": "http://localhost:2990/jira",
         "rest_path": "api",
-        "rest_api_version": "2"
+        "rest_api_version": "2",
+        "raw": False,
+        "timeout": None,
+        "pool_connections": 10,
+        "pool_maxsize": 10,
+        "keep_alive": True,
+        "max_retries": 0,
+        "search_post_threshold": 1000,
+        "cache": None,
+        "cache_ttls": None,
+        "http_cache": False,
+        "coalesce_requests": False,
+        "identity_map": False,
+        "reload": "eager"
     }
 
     SUPPRESS_CONTENT_TYPE_AUTODETECT = 'no_autodetect'
@@ -68,6 +265,45 @@ class JIRA(object):
             * server -- the server address and context path to use. Defaults to ``http://localhost:2990/jira``.
             * rest_path -- the root REST path to use. Defaults to ``api``, where the JIRA REST resources live.
             * rest_api_version -- the version of the REST resources under rest_path to use. Defaults to ``2``.
+            * raw -- return the parsed JSON dicts instead of Resources from methods that return lists of resources,
+            skipping Resource construction entirely. Each of those methods can also override this per call with its
+            own ``raw`` argument. Defaults to ``False``.
+            * timeout -- seconds to wait for the server, both to open a connection and for each read from it,
+            before giving up with an error. Defaults to ``None``, which waits forever.
+            * pool_connections -- the number of hosts to keep a pool of connections for. Defaults to ``10``.
+            * pool_maxsize -- the maximum number of idle connections kept open to one host for reuse. Set this to
+            at least the number of threads sharing the client. Defaults to ``10``.
+            * keep_alive -- whether to reuse connections between requests. Defaults to ``True``.
+            * max_retries -- the number of times a request is retried when the connection to the server fails.
+            Defaults to ``0``.
+            * search_post_threshold -- JQL strings of at least this many characters are sent to the server in the
+            body of a ``POST`` request instead of in the URL of a ``GET``, so they aren't cut short by URL length
+            limits. Use ``0`` to always search with ``POST``, or ``None`` to never do so. Defaults to ``1000``.
+            * cache -- a cache from :py:mod:`jira.cache`, such as a :py:class:`jira.cache.MemoryCache` or
+            :py:class:`jira.cache.FileCache`, to keep the responses of slow-changing metadata endpoints (fields,
+            priorities, statuses, resolutions, issue types, issue link types, server info and create metadata) in.
+            Entries are kept apart per server and user, so one cache can be shared by several clients. Defaults to
+            ``None``, which turns caching off.
+            * cache_ttls -- a dict of the number of seconds to cache each endpoint's responses for, keyed by its path
+            under the REST API (e.g. ``{'field': 86400}``), overriding :py:data:`jira.cache.DEFAULT_TTLS`. Use ``0``
+            to stop caching an endpoint. Defaults to ``None``.
+            * http_cache -- whether to keep the responses of ``GET`` requests that carry ``ETag`` or
+            ``Last-Modified`` validators and revalidate them with conditional requests, copying the JSON already
+            parsed from them when the server answers ``304 Not Modified``. ``Cache-Control`` and ``Vary`` on the
+            responses are honoured. See :py:class:`jira.cache.CachingSession`. Defaults to ``False``.
+            * coalesce_requests -- whether identical ``GET`` requests made by several threads at the same time should
+            share one request to the server and its parsed response, rather than each making their own. Useful when
+            the threads of a pool all look up the same project, user or transitions at once. See
+            :py:class:`jira.cache.CoalescingSession`. Defaults to ``False``.
+            * identity_map -- whether resources embedded in responses, such as the users, statuses and projects of
+            issues, should be shared: every embedded resource with the same ``self`` link and JSON resolves to one
+            object, and equal JSON objects and strings in a response are only kept once. This greatly cuts the memory
+            held by large sets of issues, but a shared resource changed through one issue changes for all of them.
+            The client keeps its own :py:class:`jira.resources.IdentityMap`, held with weak references. Defaults to
+            ``False``.
+            * reload -- how resources are brought up to date after ``update()`` and :py:meth:`create_issue`:
+            ``eager`` fetches them again right away, ``lazy`` waits until one of their attributes is next read, and
+            ``never`` leaves them as they were. Each call can override it. Defaults to ``eager``.
         :param basic_auth: A tuple of username and password to use when establishing a session via HTTP BASIC
         authentication.
         :param oauth: A dict of properties for OAuth authentication. The following properties are required:
@@ -80,13 +316,30 @@ class JIRA(object):
         if options is None:
             options = {}
 
-        self._options = JIRA.DEFAULT_OPTIONS
+        # each client gets its own copy, which is never modified once construction is done
+        self._options = dict(JIRA.DEFAULT_OPTIONS)
         self._options.update(options)
 
         # rip off trailing slash since all urls depend on that
         if self._options['server'].endswith('/'):
             self._options['server'] = self._options['server'][:-1]
 
+        self._base_url = '{server}/rest/api/{rest_api_version}/'.format(**self._options)
+        self._options['identity_map'] = IdentityMap() if self._options['identity_map'] else None
+
+        self._cache = self._options['cache']
+        self._cache_ttls = dict(DEFAULT_TTLS)
+        if self._options['cache_ttls'] is not None:
+            self._cache_ttls.update(self._options['cache_ttls'])
+        # responses depend on who asks, so keys name the user without exposing their credentials
+        if oauth:
+            user = hashlib.sha1(oauth['access_token']).hexdigest()
+        elif basic_auth:
+            user = basic_auth[0]
+        else:
+            user = ''
+        self._cache_prefix = u'{0} {1} '.format(self._base_url, user)
+
         self._ensure_magic()
 
         if oauth:
@@ -94,8 +347,7 @@ class JIRA(object):
         elif basic_auth:
             self._create_http_basic_session(*basic_auth)
         else:
-            verify = self._options['server'].startswith('https')
-            self._session = requests.session(verify=verify, hooks={'args': self._add_content_type})
+            self._session = self._create_session()
 
 ### Information about this client
 
@@ -103,6 +355,41 @@ class JIRA(object):
         """Get the server this client is connected to."""
         return self._options['server']
 
+### Caching
+
+    def invalidate_cache(self, path=None):
+        """
+        Drop this client's cached responses, so they are fetched from the server again the next time they are needed.
+        Does nothing unless the ``cache`` option is set.
+
+        :param path: path under the REST API of the endpoint to drop the responses of, e.g. ``'field'`` or
+            ``'issue/createmeta'``; drops every endpoint's by default
+        """
+        if self._cache is None:
+            return
+        if path is None:
+            self._cache.invalidate(self._cache_prefix)
+        else:
+            self._cache.invalidate(self._cache_prefix + path + ' ')
+
+### Concurrent calls
+
+    def executor(self, max_workers=10):
+        """
+        Get a :py:class:`JIRAExecutor` that runs calls to this client's methods on a pool of threads and returns a
+        future for each, e.g.::
+
+            with jira.executor(max_workers=8) as executor:
+                futures = [executor.submit('comments', key) for key in keys]
+                comments = [future.get() for future in futures]
+
+        All the calls share this client's HTTP session, so ``max_workers`` should be no more than the client's
+        ``pool_maxsize`` option if every thread is to reuse an open connection.
+
+        :param max_workers: the number of calls allowed to run at once
+        """
+        return JIRAExecutor(self, max_workers)
+
 ### Universal resource loading
 
     def find(self, resource_format, ids=None):
@@ -150,7 +437,7 @@ class JIRA(object):
         :param key: key of the property to set
         :param value: value to assign to the property
         """
-        url = self._options['server'] + '/rest/api/2/application-properties/' + key
+        url = self._get_url('application-properties/' + key)
         payload = {
             'id': key,
             'value': value
@@ -255,13 +542,14 @@ class JIRA(object):
 
 ### Dashboards
 
-    def dashboards(self, filter=None, startAt=0, maxResults=20):
+    def dashboards(self, filter=None, startAt=0, maxResults=20, raw=None):
         """
         Return a list of Dashboard resources.
 
         :param filter: either "favourite" or "my", the type of dashboards to return
         :param startAt: index of the first dashboard to return
         :param maxResults: maximum number of dashboards to return
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
         """
         params = {}
         if filter is not None:
@@ -270,7 +558,7 @@ class JIRA(object):
         params['maxResults'] = maxResults
 
         r_json = self._get_json('dashboard', params=params)
-        dashboards = [Dashboard(self._options, self._session, raw_dash_json) for raw_dash_json in r_json['dashboards']]
+        dashboards = self._resources(Dashboard, r_json['dashboards'], raw)
         return dashboards
 
     def dashboard(self, id):
@@ -298,10 +586,14 @@ class JIRA(object):
         """
         return self._find_for_resource(Filter, id)
 
-    def favourite_filters(self):
-        """Get a list of filter Resources which are the favourites of the currently authenticated user."""
+    def favourite_filters(self, raw=None):
+        """
+        Get a list of filter Resources which are the favourites of the currently authenticated user.
+
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
+        """
         r_json = self._get_json('filter/favourite')
-        filters = [Filter(self._options, self._session, raw_filter_json) for raw_filter_json in r_json]
+        filters = self._resources(Filter, r_json, raw)
         return filters
 
 ### Groups
@@ -342,7 +634,75 @@ class JIRA(object):
         issue.find(id, params=params)
         return issue
 
-    def create_issue(self, fields=None, prefetch=True, **fieldargs):
+    def issues(self, keys, fields=None, expand=None, chunkSize=100, workers=4, raw=None):
+        """
+        Get issue Resources for a list of issue keys, in as few requests as possible.
+
+        The keys are split into ``key in (...)`` searches of at most ``chunkSize`` keys, which run up to ``workers``
+        at a time. Long searches are sent in the body of a ``POST`` (see the ``search_post_threshold`` option), so
+        chunks are not limited by the length of a URL. The result is a list in the same order as ``keys``; keys of
+        issues that don't exist or can't be seen by the current user get ``None`` in their place instead of raising an
+        error.
+
+        An issue moved to another project is found by its old key but comes back under its new one. When a search
+        returns keys that weren't asked for, the keys it left unmatched are looked up one at a time, so moved issues
+        still take their place in the list.
+
+        :param keys: the keys of the issues to get
+        :param fields: comma-separated string of issue fields to include in the results
+        :param expand: extra information to fetch inside each resource
+        :param chunkSize: maximum number of keys to look up in one search
+        :param workers: number of searches to run concurrently
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
+        """
+        keys = list(keys)
+        unique_keys = []
+        seen = set()
+        for key in keys:
+            if key.upper() not in seen:
+                seen.add(key.upper())
+                unique_keys.append(key)
+
+        def fetch_chunk(chunk):
+            chunk_keys, jql = chunk
+            pages = self._search_pages(jql, 0, len(chunk_keys), fields, expand, validateQuery=False)
+            return chunk_keys, [raw_issue_json for resource in pages for raw_issue_json in resource['issues']]
+
+        def fetch_moved(key):
+            try:
+                return key, self.issue(key, fields=fields, expand=expand).raw
+            except JIRAError as e:
+                if e.status_code == 404:
+                    return key, None
+                raise
+
+        found = {}
+        unmatched = []
+        for chunk_keys, raw_issues in bounded_imap(fetch_chunk, key_chunks(unique_keys, chunkSize), max(workers, 1)):
+            returned = set()
+            for raw_issue_json in raw_issues:
+                found[raw_issue_json['key'].upper()] = raw_issue_json
+                returned.add(raw_issue_json['key'].upper())
+            # keys of moved issues come back changed, so the keys they were asked for by go unmatched
+            requested = set(key.upper() for key in chunk_keys)
+            if returned - requested:
+                unmatched.extend(key for key in chunk_keys if key.upper() not in returned)
+
+        for key, raw_issue_json in bounded_imap(fetch_moved, unmatched, max(workers, 1)):
+            found[key.upper()] = raw_issue_json
+
+        if raw is None:
+            raw = self._options['raw']
+        issues = []
+        for key in keys:
+            raw_issue_json = found.get(key.upper())
+            if raw_issue_json is None or raw:
+                issues.append(raw_issue_json)
+            else:
+                issues.append(Issue(self._options, self._session, raw_issue_json))
+        return issues
+
+    def create_issue(self, fields=None, prefetch=True, reload=None, **fieldargs):
         """
         Create a new issue and return an issue Resource for it.
 
@@ -360,8 +720,15 @@ class JIRA(object):
         :param fields: a dict containing field names and the values to use. If present, all other keyword arguments\
         will be ignored
         :param prefetch: whether to reload the created issue Resource so that all of its data is present in the value\
-        returned from this method
+        returned from this method; ``False`` is the same as a ``reload`` of ``'never'``
+        :param reload: ``'eager'`` to fetch the created issue right away, ``'lazy'`` to return an issue whose key and\
+        ID are set and that is only fetched when another attribute is read, or ``'never'`` to return an issue with\
+        only the key, ID and link the server answered with; defaults to the ``reload`` option
         """
+        if reload is None and not prefetch:
+            reload = 'never'
+        reload = reload_policy(reload, self._options)
+
         data = {}
         if fields is not None:
             data['fields'] = fields
@@ -376,10 +743,14 @@ class JIRA(object):
         raise_on_error(r)
 
         raw_issue_json = json.loads(r.text)
-        if prefetch:
+        if reload == 'eager':
             return self.issue(raw_issue_json['key'])
-        else:
-            return Issue(self._options, self._session, raw=raw_issue_json)
+
+        issue = Issue(self._options, self._session, raw=raw_issue_json)
+        if reload == 'lazy':
+            # the server has already said what its key and ID are, so reading them needn't load the issue
+            issue._mark_stale()
+        return issue
 
     def createmeta(self, projectKeys=None, projectIds=None, issuetypeIds=None, issuetypeNames=None, expand=None):
         """
@@ -417,21 +788,22 @@ class JIRA(object):
         :param issue: the issue to assign
         :param assignee: the user to assign the issue to
         """
-        url = self._options['server'] + '/rest/api/2/issue/' + issue + '/assignee'
+        url = self._get_url('issue/' + issue + '/assignee')
         payload = {'name': assignee}
         r = self._session.put(url, data=json.dumps(payload))
         raise_on_error(r)
 
     @translate_resource_args
-    def comments(self, issue):
+    def comments(self, issue, raw=None):
         """
         Get a list of comment Resources.
 
         :param issue: the issue to get comments from
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
         """
         r_json = self._get_json('issue/' + issue + '/comment')
 
-        comments = [Comment(self._options, self._session, raw_comment_json) for raw_comment_json in r_json['comments']]
+        comments = self._resources(Comment, r_json['comments'], raw)
         return comments
 
     @translate_resource_args
@@ -480,14 +852,15 @@ class JIRA(object):
         return self._get_json('issue/' + issue + '/editmeta')
 
     @translate_resource_args
-    def remote_links(self, issue):
+    def remote_links(self, issue, raw=None):
         """
         Get a list of remote link Resources from an issue.
 
         :param issue: the issue to get remote links from
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
         """
         r_json = self._get_json('issue/' + issue + '/remotelink')
-        remote_links = [RemoteLink(self._options, self._session, raw_remotelink_json) for raw_remotelink_json in r_json]
+        remote_links = self._resources(RemoteLink, r_json, raw)
         return remote_links
 
     @translate_resource_args
@@ -644,14 +1017,15 @@ class JIRA(object):
         self._session.delete(url, params=params)
 
     @translate_resource_args
-    def worklogs(self, issue):
+    def worklogs(self, issue, raw=None):
         """
         Get a list of worklog Resources from the server for an issue.
 
         :param issue: ID or key of the issue to get worklogs from
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
         """
         r_json = self._get_json('issue/' + issue + '/worklog')
-        worklogs = [Worklog(self._options, self._session, raw_worklog_json) for raw_worklog_json in r_json['worklogs']]
+        worklogs = self._resources(Worklog, r_json['worklogs'], raw)
         return worklogs
 
     @translate_resource_args
@@ -737,10 +1111,14 @@ class JIRA(object):
 
 ### Issue link types
 
-    def issue_link_types(self):
-        """Get a list of issue link type Resources from the server."""
+    def issue_link_types(self, raw=None):
+        """
+        Get a list of issue link type Resources from the server.
+
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
+        """
         r_json = self._get_json('issueLinkType')
-        link_types = [IssueLinkType(self._options, self._session, raw_link_json) for raw_link_json in r_json['issueLinkTypes']]
+        link_types = self._resources(IssueLinkType, r_json['issueLinkTypes'], raw)
         return link_types
 
     def issue_link_type(self, id):
@@ -753,10 +1131,14 @@ class JIRA(object):
 
 ### Issue types
 
-    def issue_types(self):
-        """Get a list of issue type Resources from the server."""
+    def issue_types(self, raw=None):
+        """
+        Get a list of issue type Resources from the server.
+
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
+        """
         r_json = self._get_json('issuetype')
-        issue_types = [IssueType(self._options, self._session, raw_type_json) for raw_type_json in r_json]
+        issue_types = self._resources(IssueType, r_json, raw)
         return issue_types
 
     def issue_type(self, id):
@@ -792,10 +1174,14 @@ class JIRA(object):
 
 ### PrioritiesK
 
-    def priorities(self):
-        """Get a list of priority Resources from the server."""
+    def priorities(self, raw=None):
+        """
+        Get a list of priority Resources from the server.
+
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
+        """
         r_json = self._get_json('priority')
-        priorities = [Priority(self._options, self._session, raw_priority_json) for raw_priority_json in r_json]
+        priorities = self._resources(Priority, r_json, raw)
         return priorities
 
     def priority(self, id):
@@ -808,10 +1194,14 @@ class JIRA(object):
 
 ### Projects
 
-    def projects(self):
-        """Get a list of project Resources from the server visible to the current authenticated user."""
+    def projects(self, raw=None):
+        """
+        Get a list of project Resources from the server visible to the current authenticated user.
+
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
+        """
         r_json = self._get_json('project')
-        projects = [Project(self._options, self._session, raw_project_json) for raw_project_json in r_json]
+        projects = self._resources(Project, r_json, raw)
         return projects
 
     def project(self, id):
@@ -922,25 +1312,27 @@ class JIRA(object):
         raise_on_error(r)
 
     @translate_resource_args
-    def project_components(self, project):
+    def project_components(self, project, raw=None):
         """
         Get a list of component Resources present on a project.
 
         :param project: ID or key of the project to get components from
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
         """
         r_json = self._get_json('project/' + project + '/components')
-        components = [Component(self._options, self._session, raw_comp_json) for raw_comp_json in r_json]
+        components = self._resources(Component, r_json, raw)
         return components
 
     @translate_resource_args
-    def project_versions(self, project):
+    def project_versions(self, project, raw=None):
         """
         Get a list of version Resources present on a project.
 
         :param project: ID or key of the project to get versions from
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
         """
         r_json = self._get_json('project/' + project + '/versions')
-        versions = [Version(self._options, self._session, raw_ver_json) for raw_ver_json in r_json]
+        versions = self._resources(Version, r_json, raw)
         return versions
 
     # non-resource
@@ -965,10 +1357,14 @@ class JIRA(object):
 
 ### Resolutions
 
-    def resolutions(self):
-        """Get a list of resolution Resources from the server."""
+    def resolutions(self, raw=None):
+        """
+        Get a list of resolution Resources from the server.
+
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
+        """
         r_json = self._get_json('resolution')
-        resolutions = [Resolution(self._options, self._session, raw_res_json) for raw_res_json in r_json]
+        resolutions = self._resources(Resolution, r_json, raw)
         return resolutions
 
     def resolution(self, id):
@@ -981,7 +1377,7 @@ class JIRA(object):
 
 ### Search
 
-    def search_issues(self, jql_str, startAt=0, maxResults=50, fields=None, expand=None):
+    def search_issues(self, jql_str, startAt=0, maxResults=50, fields=None, expand=None, raw=None):
         """
         Get a list of issue Resources matching a JQL search string.
 
@@ -990,22 +1386,138 @@ class JIRA(object):
         :param maxResults: maximum number of issues to return
         :param fields: comma-separated string of issue fields to include in the results
         :param expand: extra information to fetch inside each resource
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
         """
-        # TODO what to do about the expand, which isn't related to the issues?
-        if fields is None:
-            fields = []
+        resource = self._search(jql_str, startAt, maxResults, fields, expand)
+        issues = self._resources(Issue, resource['issues'], raw)
+        return issues
 
-        search_params = {
-            "jql": jql_str,
-            "startAt": startAt,
-            "maxResults": maxResults,
-            "fields": fields,
-            "expand": expand
-        }
+    def iter_issues(self, jql_str, startAt=0, pageSize=50, fields=None, expand=None, workers=1, keyset=False,
+                    targetLatency=None, targetBytes=None, raw=None):
+        """
+        Get a generator of issue Resources matching a JQL search string, following the search results across as
+        many pages as needed.
 
-        resource = self._get_json('search', search_params)
-        issues = [Issue(self._options, self._session, raw_issue_json) for raw_issue_json in resource['issues']]
-        return issues
+        Pages are requested lazily as the generator is consumed, so only one page of results is held in memory at any
+        time. The ``total`` reported by the server is used to stop as soon as the last page has been read.
+
+        With ``workers`` greater than one, the offsets of the remaining pages are computed from the first page and
+        up to ``workers`` of them are fetched concurrently ahead of the consumer. Issues are still yielded in search
+        order.
+
+        With ``keyset`` set, results are ordered by issue ID and each page after the first is requested with an
+        ``id > <last seen ID>`` clause instead of a growing ``startAt`` offset. Every page then costs the server the
+        same no matter how deep into the results it is, and issues that change while paging are neither skipped nor
+        repeated. The JQL string must not contain its own ``ORDER BY`` clause in this mode.
+
+        With ``targetLatency`` or ``targetBytes`` set, the page size adapts as pages arrive: ``pageSize`` is only the
+        size of the first page, and each following page is made bigger or smaller so that it takes about
+        ``targetLatency`` seconds to fetch and holds about ``targetBytes`` bytes of JSON. This suits searches whose cost
+        per issue is hard to guess, since it depends heavily on ``fields`` and ``expand``. The page size never exceeds
+        the maximum the server reports using when it caps ``maxResults``. Adaptive pages are fetched one after another
+        and cannot use ``workers``.
+
+        :param jql_str: the JQL search string to use
+        :param startAt: index of the first issue to return
+        :param pageSize: number of issues to request from the server per page
+        :param fields: comma-separated string of issue fields to include in the results
+        :param expand: extra information to fetch inside each resource
+        :param workers: number of pages to fetch concurrently
+        :param keyset: whether to page through the results by issue ID rather than by offset
+        :param targetLatency: number of seconds each page should take to fetch
+        :param targetBytes: number of bytes of JSON each page should hold
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
+        """
+        sizer = None
+        if targetLatency is not None or targetBytes is not None:
+            if workers > 1:
+                raise ValueError('adaptive page sizes are chosen one page at a time and cannot use workers')
+            sizer = AdaptivePageSize(pageSize, targetLatency, targetBytes)
+
+        if keyset:
+            if order_by_position(jql_str) is not None:
+                raise ValueError('keyset pagination orders by issue ID; remove the ORDER BY clause from the JQL')
+            if workers > 1:
+                raise ValueError('keyset pagination fetches pages one after another and cannot use workers')
+            pages = self._keyset_pages(jql_str, startAt, pageSize, fields, expand, sizer)
+        else:
+            pages = self._search_pages(jql_str, startAt, pageSize, fields, expand, workers, sizer=sizer)
+
+        if raw is None:
+            raw = self._options['raw']
+        if raw:
+            return (raw_issue_json for resource in pages for raw_issue_json in resource['issues'])
+        return (Issue(self._options, self._session, raw_issue_json)
+                for resource in pages for raw_issue_json in resource['issues'])
+
+    def iter_issues_sharded(self, jql_str, shardSize=1000, workers=4, pageSize=100, fields=None, expand=None,
+                            raw=None):
+        """
+        Get a generator of issue Resources matching a JQL search string, split into disjoint ranges of issue IDs that
+        are searched concurrently. Suited to scans over a whole instance, where a single search is held back by the
+        server sorting every matching issue for each page, even when the pages are fetched in parallel.
+
+        The range of matching IDs is found with two single-issue searches and then halved, using count-only searches,
+        until no shard holds more than ``shardSize`` issues. Up to ``workers`` shards are then read at once, each
+        with keyset pagination, and the issues are yielded in issue ID order. Each shard in flight is held in memory
+        until it has been read in full. The JQL string must not contain its own ``ORDER BY`` clause.
+
+        :param jql_str: the JQL search string to use
+        :param shardSize: the largest number of issues to read in one shard
+        :param workers: number of shards to read concurrently
+        :param pageSize: number of issues to request from the server per page within a shard
+        :param fields: comma-separated string of issue fields to include in the results
+        :param expand: extra information to fetch inside each resource
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
+        """
+        if order_by_position(jql_str) is not None:
+            raise ValueError('sharded searches order by issue ID; remove the ORDER BY clause from the JQL')
+        workers = max(workers, 1)
+
+        def read_shard(shard):
+            shard_jql = restrict_jql(jql_str, 'id >= {0} AND id <= {1}'.format(*shard))
+            return [raw_issue_json for resource in self._keyset_pages(shard_jql, 0, pageSize, fields, expand)
+                    for raw_issue_json in resource['issues']]
+
+        shards = bounded_imap(read_shard, self._id_shards(jql_str, shardSize, workers), workers)
+        raw_issues = (raw_issue_json for shard in shards for raw_issue_json in shard)
+
+        if raw is None:
+            raw = self._options['raw']
+        if raw:
+            return raw_issues
+        return (Issue(self._options, self._session, raw_issue_json) for raw_issue_json in raw_issues)
+
+    def count_issues(self, jql_str):
+        """
+        Get the number of issues matching a JQL search string, without downloading any of them.
+
+        :param jql_str: the JQL search string to use
+        """
+        return self._search(jql_str, 0, 0)['total']
+
+    def count_issues_by(self, jql_str, field, values, workers=4):
+        """
+        Get the number of issues matching a JQL search string for each of several values of one field, e.g. the
+        number of open issues per assignee. One count search per value is run, up to ``workers`` at a time.
+
+        Returns a dict mapping each value to its count. A value of ``None`` counts the issues where the field is
+        empty.
+
+        :param jql_str: the JQL search string to use
+        :param field: the name of the field to group by, as used in JQL (e.g. ``status``, ``assignee``, ``fixVersion``)
+        :param values: the values of the field to count issues for
+        :param workers: number of count searches to run concurrently
+        """
+        def count(value):
+            if value is None:
+                clause = '{0} is EMPTY'.format(field)
+            else:
+                clause = '{0} = {1}'.format(field, jql_string(unicode(value)))
+            return self.count_issues(restrict_jql(jql_str, clause))
+
+        values = list(values)
+        return dict(zip(values, bounded_imap(count, values, max(workers, 1))))
 
 ### Security levels
 
@@ -1026,10 +1538,14 @@ class JIRA(object):
 
 ### Status
 
-    def statuses(self):
-        """Get a list of status Resources from the server."""
+    def statuses(self, raw=None):
+        """
+        Get a list of status Resources from the server.
+
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
+        """
         r_json = self._get_json('status')
-        statuses = [Status(self._options, self._session, raw_stat_json) for raw_stat_json in r_json]
+        statuses = self._resources(Status, r_json, raw)
         return statuses
 
     def status(self, id):
@@ -1056,7 +1572,7 @@ class JIRA(object):
         user.find(id, params=params)
         return user
 
-    def search_assignable_users_for_projects(self, username, projectKeys, startAt=0, maxResults=50):
+    def search_assignable_users_for_projects(self, username, projectKeys, startAt=0, maxResults=50, raw=None):
         """
         Get a list of user Resources that match the search string and can be assigned issues for projects.
 
@@ -1064,6 +1580,7 @@ class JIRA(object):
         :param projectKeys: comma-separated list of project keys to check for issue assignment permissions
         :param startAt: index of the first user to return
         :param maxResults: maximum number of users to return
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
         """
         params = {
             'username': username,
@@ -1072,11 +1589,11 @@ class JIRA(object):
             'maxResults': maxResults
         }
         r_json = self._get_json('user/assignable/multiProjectSearch', params)
-        users = [User(self._options, self._session, raw_user_json) for raw_user_json in r_json]
+        users = self._resources(User, r_json, raw)
         return users
 
     def search_assignable_users_for_issues(self, username, project=None, issueKey=None, expand=None, startAt=0,
-                                           maxResults=50):
+                                           maxResults=50, raw=None):
         """
         Get a list of user Resources that match the search string for assigning or creating issues.
 
@@ -1091,6 +1608,7 @@ class JIRA(object):
         :param expand: extra information to fetch inside each resource
         :param startAt: index of the first user to return
         :param maxResults: maximum number of users to return
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
         """
         params = {
             'username': username,
@@ -1104,7 +1622,7 @@ class JIRA(object):
         if expand is not None:
             params['expand'] = expand
         r_json = self._get_json('user/assignable/search', params)
-        users = [User(self._options, self._session, raw_user_json) for raw_user_json in r_json]
+        users = self._resources(User, r_json, raw)
         return users
 
     # non-resource
@@ -1203,13 +1721,14 @@ class JIRA(object):
         r = self._session.delete(url, params=params)
         raise_on_error(r)
 
-    def search_users(self, user, startAt=0, maxResults=50):
+    def search_users(self, user, startAt=0, maxResults=50, raw=None):
         """
         Get a list of user Resources that match the specified search string.
 
         :param user: a string to match usernames against
         :param startAt: index of the first user to return
         :param maxResults: maximum number of users to return
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
         """
         params = {
             'username': user,
@@ -1217,10 +1736,10 @@ class JIRA(object):
             'maxResults': maxResults
         }
         r_json = self._get_json('user/search', params)
-        users = [User(self._options, self._session, raw_user_json) for raw_user_json in r_json]
+        users = self._resources(User, r_json, raw)
         return users
 
-    def search_allowed_users_for_issue(self, user, issueKey=None, projectKey=None, startAt=0, maxResults=50):
+    def search_allowed_users_for_issue(self, user, issueKey=None, projectKey=None, startAt=0, maxResults=50, raw=None):
         """
         Get a list of user Resources that match a username string and have browse permission for the issue or
         project.
@@ -1230,6 +1749,7 @@ class JIRA(object):
         :param projectKey: find users with browse permission for this project
         :param startAt: index of the first user to return
         :param maxResults: maximum number of users to return
+        :param raw: whether to return the parsed JSON dicts instead of Resources; defaults to the ``raw`` option
         """
         params = {
             'username': user,
@@ -1241,7 +1761,7 @@ class JIRA(object):
         if projectKey is not None:
             params['projectKey'] = projectKey
         r_json = self._get_json('user/viewissue/search', params)
-        users = [User(self._options, self._session, raw_user_json) for raw_user_json in r_json]
+        users = self._resources(User, r_json, raw)
         return users
 
 ### Versions
@@ -1316,8 +1836,8 @@ class JIRA(object):
         :param id: the version to count issues for
         """
         r_json = self._get_json('version/' + id + '/relatedIssueCounts')
-        del r_json['self']   # this isn't really an addressable resource
-        return r_json
+        # this isn't really an addressable resource; copy rather than change what may be a cached response
+        return dict((key, value) for key, value in r_json.iteritems() if key != 'self')
 
     def version_count_unresolved_issues(self, id):
         """
@@ -1369,21 +1889,34 @@ class JIRA(object):
             'password': password
         }
 
-        verify = self._options['server'].startswith('https')
-        self._session = requests.session(verify=verify,
-                                         hooks={'args': self._add_content_type},
-                                         auth=(username, password))
+        self._session = self._create_session(auth=(username, password))
         r = self._session.post(url, data=json.dumps(payload))
         raise_on_error(r)
 
     def _create_oauth_session(self, oauth):
-        verify = self._options['server'].startswith('https')
         oauth_hook = OAuthHook(access_token=oauth['access_token'], access_token_secret=oauth['access_token_secret'],
                                consumer_key=oauth['consumer_key'], key_cert=oauth['key_cert'],
                                consumer_secret='', header_auth=True)
-        self._session = requests.session(verify=verify,
-                                         hooks={'pre_request': oauth_hook,
-                                                'args': self._add_content_type})
+        self._session = self._create_session(hooks={'pre_request': oauth_hook})
+
+    def _create_session(self, auth=None, hooks=None):
+        verify = self._options['server'].startswith('https')
+        session_hooks = {'args': self._add_content_type}
+        if hooks is not None:
+            session_hooks.update(hooks)
+        config = {
+            'pool_connections': self._options['pool_connections'],
+            'pool_maxsize': self._options['pool_maxsize'],
+            'keep_alive': self._options['keep_alive'],
+            'max_retries': self._options['max_retries'],
+        }
+        session = requests.session(verify=verify, hooks=session_hooks, auth=auth, timeout=self._options['timeout'],
+                                   config=config)
+        if self._options['http_cache']:
+            session = CachingSession(session)
+        if self._options['coalesce_requests']:
+            session = CoalescingSession(session)
+        return session
 
     def _set_avatar(self, params, url, avatar):
         data = {
@@ -1393,16 +1926,162 @@ class JIRA(object):
         raise_on_error(r)
 
     def _get_url(self, path):
-        options = self._options
-        options.update({'path': path})
-        return '{server}/rest/api/{rest_api_version}/{path}'.format(**options)
+        return self._base_url + path
+
+    def _get_json(self, path, params=None, on_response=None):
+        ttl = self._cache_ttls.get(path) if self._cache is not None and on_response is None else None
+        if ttl:
+            cache_key = self._cache_prefix + path + ' ' + json.dumps(params, sort_keys=True)
+            r_json = self._cache.get(cache_key)
+            if r_json is not None:
+                return r_json
 
-    def _get_json(self, path, params=None):
         url = self._get_url(path)
         r = self._session.get(url, params=params)
         raise_on_error(r)
+        if on_response is not None:
+            on_response(r)
+
+        r_json = parsed_json(r, json_object_hook(self._options))
+        if ttl:
+            self._cache.set(cache_key, r_json, ttl)
+        return r_json
+
+    def _resources(self, resource_cls, raw_list, raw=None):
+        if raw is None:
+            raw = self._options['raw']
+        if raw:
+            return raw_list
+        return [resource_cls(self._options, self._session, raw_json) for raw_json in raw_list]
+
+    def _search(self, jql_str, startAt, maxResults, fields=None, expand=None, validateQuery=True, on_response=None):
+        # TODO what to do about the expand, which isn't related to the issues?
+        if fields is None:
+            fields = []
+
+        threshold = self._options['search_post_threshold']
+        if threshold is not None and len(jql_str) >= threshold:
+            return self._post_search(jql_str, startAt, maxResults, fields, expand, validateQuery, on_response)
+
+        search_params = {
+            "jql": jql_str,
+            "startAt": startAt,
+            "maxResults": maxResults,
+            "fields": fields,
+            "expand": expand
+        }
+        if not validateQuery:
+            # report unknown values in the JQL (such as keys of deleted issues) as warnings rather than errors
+            search_params['validateQuery'] = 'false'
+        return self._get_json('search', search_params, on_response)
+
+    def _post_search(self, jql_str, startAt, maxResults, fields, expand, validateQuery, on_response=None):
+        # the POST body takes lists where the query string takes comma-separated values
+        if isinstance(fields, basestring):
+            fields = fields.split(',')
+        if isinstance(expand, basestring):
+            expand = expand.split(',')
+
+        data = {
+            'jql': jql_str,
+            'startAt': startAt,
+            'maxResults': maxResults,
+            'validateQuery': validateQuery
+        }
+        if fields:
+            data['fields'] = list(fields)
+        if expand:
+            data['expand'] = list(expand)
+        return self._post_json('search', data, on_response)
+
+    def _search_pages(self, jql_str, startAt, pageSize, fields=None, expand=None, workers=1, validateQuery=True,
+                      sizer=None):
+        resource = self._search_page(jql_str, startAt, pageSize, fields, expand, validateQuery, sizer)
+        yield resource
+
+        raw_issues = resource['issues']
+        total = resource['total']
+        startAt += len(raw_issues)
+        if not raw_issues or startAt >= total:
+            return
+
+        if workers > 1:
+            # the server may silently cap maxResults, so the first page tells us the real stride between offsets
+            pageSize = len(raw_issues)
+            fetch_page = lambda offset: self._search(jql_str, offset, pageSize, fields, expand, validateQuery)
+            for resource in bounded_imap(fetch_page, xrange(startAt, total, pageSize), workers):
+                yield resource
+            return
+
+        while True:
+            resource = self._search_page(jql_str, startAt, pageSize, fields, expand, validateQuery, sizer)
+            yield resource
+
+            raw_issues = resource['issues']
+            startAt += len(raw_issues)
+            if not raw_issues or startAt >= resource['total']:
+                return
+
+    def _keyset_pages(self, jql_str, startAt, pageSize, fields=None, expand=None, sizer=None):
+        last_id = None
+        while True:
+            resource = self._search_page(keyset_jql(jql_str, last_id), startAt, pageSize, fields, expand, True, sizer)
+            yield resource
+
+            # each page's total only counts the issues after the last one we saw
+            raw_issues = resource['issues']
+            if not raw_issues or len(raw_issues) >= resource['total'] - startAt:
+                return
+            last_id = raw_issues[-1]['id']
+            startAt = 0
+
+    def _id_shards(self, jql_str, shardSize, workers):
+        # a generator, so that none of these searches are made until the caller starts reading the issues; the bounds
+        # of the matching IDs come from the first issue in each direction
+        first = self._search(keyset_jql(jql_str), 0, 1, 'id')
+        if not first['issues']:
+            return
+        last = self._search(keyset_jql(jql_str, descending=True), 0, 1, 'id')
+        pending = [(int(first['issues'][0]['id']), int(last['issues'][0]['id']), first['total'])]
+
+        def count_half(half):
+            return self.count_issues(restrict_jql(jql_str, 'id >= {0} AND id <= {1}'.format(*half)))
+
+        # halve every range holding too many issues, counting the halves of one round concurrently; both halves are
+        # counted, since issues may start or stop matching between searches, and only a range counted as empty is
+        # left out
+        shards = []
+        while pending:
+            shards.extend(shard for shard in pending if shard[2] <= shardSize or shard[0] == shard[1])
+            halves = []
+            for low, high, count in pending:
+                if count > shardSize and low < high:
+                    middle = (low + high) // 2
+                    halves.extend(((low, middle), (middle + 1, high)))
+            counts = bounded_imap(count_half, halves, workers)
+            pending = [(low, high, count) for (low, high), count in zip(halves, counts) if count > 0]
+
+        for low, high in sorted((low, high) for low, high, count in shards if count > 0):
+            yield low, high
+
+    def _search_page(self, jql_str, startAt, pageSize, fields, expand, validateQuery, sizer):
+        if sizer is None:
+            return self._search(jql_str, startAt, pageSize, fields, expand, validateQuery)
+
+        started = time.time()
+        resource = self._search(jql_str, startAt, sizer.pageSize, fields, expand, validateQuery,
+                                sizer.response_received)
+        sizer.page_received(resource, time.time() - started)
+        return resource
+
+    def _post_json(self, path, data, on_response=None):
+        url = self._get_url(path)
+        r = self._session.post(url, data=json.dumps(data))
+        raise_on_error(r)
+        if on_response is not None:
+            on_response(r)
 
-        r_json = json.loads(r.text)
+        r_json = json.loads(r.text, object_hook=json_object_hook(self._options))
         return r_json
 
     def _find_for_resource(self, resource_cls, ids, expand=None):
@@ -0,0 +1,203 @@
+"""
+This module implements a local mirror of JIRA issues in a SQLite database. The mirror is filled and kept up to date
+from the server with a :py:class:`jira.changefeed.ChangeFeed`, and reads from it return the same Resource objects as
+the client, without a round trip to the server.
+"""
+import json
+import sqlite3
+
+from jira.changefeed import ChangeFeed
+from jira.resources import Issue, Comment, Worklog
+
+# the search's default fields leave out comments and worklogs, which would then take two more requests per issue
+FIELDS = '*navigable,comment,worklog'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    project TEXT,
+    status TEXT,
+    assignee TEXT,
+    updated TEXT,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS issues_project ON issues (project);
+CREATE INDEX IF NOT EXISTS issues_status ON issues (status);
+CREATE INDEX IF NOT EXISTS issues_assignee ON issues (assignee);
+CREATE INDEX IF NOT EXISTS issues_updated ON issues (updated);
+
+CREATE TABLE IF NOT EXISTS comments (
+    id TEXT PRIMARY KEY,
+    issue_id TEXT NOT NULL,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS comments_issue_id ON comments (issue_id);
+
+CREATE TABLE IF NOT EXISTS worklogs (
+    id TEXT PRIMARY KEY,
+    issue_id TEXT NOT NULL,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS worklogs_issue_id ON worklogs (issue_id);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class Mirror(object):
+    """
+    A SQLite copy of the issues matching a JQL search, along with their comments and worklogs.
+
+    Each issue is stored as its raw JSON, next to indexed columns for its key, project key, status name, assignee
+    username and ``updated`` timestamp that the read methods filter on. The first :py:meth:`sync` loads every matching
+    issue; later ones only fetch the issues that changed since, using the change feed's watermark, which is kept in
+    the same database. Issues deleted on the server or no longer matching the search stay in the mirror.
+
+    A mirror's SQLite connection belongs to the thread that created it.
+
+    :param jira: the :py:class:`jira.client.JIRA` client to sync with; its options and session are also given to the
+        Resources read from the mirror
+    :param path: path of the SQLite database file, created if it doesn't exist
+    :param jql_str: the JQL search string selecting the issues to mirror; an empty string mirrors every issue
+    :param pageSize: number of issues to request from the server per page while syncing
+    """
+
+    def __init__(self, jira, path, jql_str='', pageSize=100):
+        self._jira = jira
+        self.path = path
+        self.jql_str = jql_str
+        self.pageSize = pageSize
+        self._db = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        self._db.close()
+
+    def sync(self):
+        """
+        Fetch the issues that changed since the last sync, or every matching issue on the first one, and store them
+        with their comments and worklogs. Changes are committed a page at a time, so an interrupted sync keeps what it
+        has stored and the next one picks up the rest. Returns the number of issues stored.
+        """
+        feed = ChangeFeed(self._jira, self.jql_str, pageSize=self.pageSize, fields=FIELDS)
+        state = dict(self._db.execute('SELECT name, value FROM sync_state'))
+        if 'watermark' in state:
+            feed.watermark = state['watermark']
+            feed.seen = json.loads(state['seen'])
+
+        count = 0
+        try:
+            for raw_issue_json in feed.poll(raw=True):
+                self._store(raw_issue_json)
+                count += 1
+                if count % self.pageSize == 0:
+                    self._db.commit()
+        except:
+            # keep the issues already stored, but not the watermark, which has moved past the one that failed
+            self._db.commit()
+            raise
+
+        if feed.watermark is not None:
+            self._db.executemany('INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)',
+                                 [('watermark', feed.watermark), ('seen', json.dumps(feed.seen))])
+        self._db.commit()
+        return count
+
+    def issue(self, id):
+        """
+        Get an issue Resource from the mirror, or ``None`` if it isn't there.
+
+        :param id: ID or key of the issue to get
+        """
+        row = self._db.execute('SELECT raw FROM issues WHERE id = ? OR key = ?', (id, id)).fetchone()
+        if row is None:
+            return None
+        return Issue(self._jira._options, self._jira._session, json.loads(row[0]))
+
+    def issues(self, project=None, status=None, assignee=None, updatedSince=None):
+        """
+        Get a list of issue Resources from the mirror, ordered by ID. Every argument given narrows the list down.
+
+        :param project: key of the project the issues belong to
+        :param status: name of the issues' status
+        :param assignee: username of the issues' assignee
+        :param updatedSince: ISO 8601 timestamp, as rendered by JIRA, of the earliest update to include
+        """
+        clauses = []
+        params = []
+        for column, value in (('project', project), ('status', status), ('assignee', assignee)):
+            if value is not None:
+                clauses.append(column + ' = ?')
+                params.append(value)
+        if updatedSince is not None:
+            clauses.append('updated >= ?')
+            params.append(updatedSince)
+
+        query = 'SELECT raw FROM issues'
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += ' ORDER BY CAST(id AS INTEGER)'
+        return [Issue(self._jira._options, self._jira._session, json.loads(raw))
+                for raw, in self._db.execute(query, params)]
+
+    def comments(self, issue):
+        """
+        Get a list of comment Resources for an issue from the mirror.
+
+        :param issue: ID or key of the issue to get comments for
+        """
+        return self._children('comments', Comment, issue)
+
+    def worklogs(self, issue):
+        """
+        Get a list of worklog Resources for an issue from the mirror.
+
+        :param issue: ID or key of the issue to get worklogs for
+        """
+        return self._children('worklogs', Worklog, issue)
+
+    def _children(self, table, resource_cls, issue):
+        query = ('SELECT {0}.raw FROM {0} JOIN issues ON issues.id = {0}.issue_id WHERE issues.id = ? OR issues.key = ?'
+                 ' ORDER BY CAST({0}.id AS INTEGER)').format(table)
+        return [resource_cls(self._jira._options, self._jira._session, json.loads(raw))
+                for raw, in self._db.execute(query, (issue, issue))]
+
+    def _store(self, raw_issue_json):
+        issue_id = raw_issue_json['id']
+        fields = raw_issue_json['fields']
+        project = fields.get('project') or {}
+        status = fields.get('status') or {}
+        assignee = fields.get('assignee') or {}
+        self._db.execute('INSERT OR REPLACE INTO issues (id, key, project, status, assignee, updated, raw) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (issue_id, raw_issue_json['key'], project.get('key'), status.get('name'), assignee.get('name'),
+                          fields.get('updated'), json.dumps(raw_issue_json)))
+
+        comments = self._embedded(fields, 'comment', 'comments', self._jira.comments, issue_id)
+        worklogs = self._embedded(fields, 'worklog', 'worklogs', self._jira.worklogs, issue_id)
+        for table, children in (('comments', comments), ('worklogs', worklogs)):
+            # replace them all, so comments and worklogs deleted on the server go away here too
+            self._db.execute('DELETE FROM {0} WHERE issue_id = ?'.format(table), (issue_id,))
+            self._db.executemany('INSERT OR REPLACE INTO {0} (id, issue_id, raw) VALUES (?, ?, ?)'.format(table),
+                                 [(child['id'], issue_id, json.dumps(child)) for child in children])
+
+    def _embedded(self, fields, field, list_name, fetch, issue_id):
+        # search results embed the first comments and worklogs of each issue; only fetch them when the search cut the
+        # list short
+        embedded = fields.get(field)
+        if embedded is not None and len(embedded[list_name]) >= embedded.get('total', 0):
+            return embedded[list_name]
+        return fetch(issue_id, raw=True)
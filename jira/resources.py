@@ -4,10 +4,21 @@ into usable objects.
 """
 
 import re
+from threading import Lock
+from weakref import WeakValueDictionary
+
+from jira.cache import parsed_json
 from jira.exceptions import raise_on_error
 import json
 
 
+# ways to bring a resource up to date after writing to it; see Resource.update
+RELOAD_POLICIES = ('eager', 'lazy', 'never')
+
+# properties that stay readable on a resource left stale by a lazy reload
+IDENTIFYING_PROPERTIES = ('key', 'id')
+
+
 class Resource(object):
     """
     Models a URL-addressable resource in the JIRA REST API.
@@ -42,6 +53,27 @@ class Resource(object):
         self.raw = None
         self.self = None
 
+    def __getattr__(self, item):
+        # a resource left stale by a lazy reload is loaded again by the first read of anything it had loaded
+        if self.__dict__.get('_stale') and not item.startswith('__'):
+            self._load(self.self)
+            return getattr(self, item)
+
+        # only called for attributes not yet materialized from the raw JSON; plain values are served straight from
+        # raw every time, while the Resource and PropertyHolder views built over nested dicts, and copies of lists,
+        # are kept
+        raw = self.__dict__.get('raw')
+        if raw is None or item.startswith('__') or item not in raw:
+            raise AttributeError("'{0}' object has no attribute '{1}'".format(type(self).__name__, item))
+
+        value = materialize(raw[item], self._options, self._session)
+        if value is not raw[item]:
+            setattr(self, item, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(dir(type(self)) + self.__dict__.keys() + (self.__dict__.get('raw') or {}).keys()))
+
     def find(self, ids=None, headers=None, params=None):
         if ids is None:
             ids = ()
@@ -59,12 +91,17 @@ class Resource(object):
         headers = self._default_headers(headers)
         self._load(url, headers, params)
 
-    def update(self, **kwargs):
+    def update(self, reload=None, **kwargs):
         """
         Update this resource on the server. Keyword arguments are marshalled into a dict before being sent. If this
         resource doesn't support ``PUT``, a :py:exc:`.JIRAError` will be raised; subclasses that specialize this method
         will only raise errors in case of user error.
+
+        :param reload: how to bring this object up to date with the server afterwards: ``'eager'`` to load it again
+            right away, ``'lazy'`` to load it again when one of its attributes is next read, or ``'never'`` to leave
+            it as it was; defaults to the ``reload`` option of the client
         """
+        reload = reload_policy(reload, self._options)
         data = {}
         for arg in kwargs:
             data[arg] = kwargs[arg]
@@ -72,7 +109,7 @@ class Resource(object):
         r = self._session.put(self.self, data=json.dumps(data))
         raise_on_error(r)
 
-        self._load(self.self)
+        self._reload(reload)
 
     def delete(self, params=None):
         """
@@ -87,11 +124,38 @@ class Resource(object):
         r = self._session.get(url, headers=headers, params=params)
         raise_on_error(r)
 
-        self._parse_raw(json.loads(r.text))
+        self._parse_raw(parsed_json(r, json_object_hook(self._options)))
 
     def _parse_raw(self, raw):
+        # forget attributes materialized from a previous load; they are rebuilt from the new JSON on demand
+        self._forget(self.__dict__.get('raw'))
+        if self.__dict__.pop('_stale', False):
+            self._forget(IDENTIFYING_PROPERTIES)
+
         self.raw = raw
-        dict2resource(raw, self, self._options, self._session)
+        if 'self' in raw:
+            self.self = raw['self']
+
+    def _forget(self, raw):
+        for item in raw or ():
+            if item not in ('raw', 'self') and not item.startswith('_'):
+                self.__dict__.pop(item, None)
+
+    def _reload(self, reload):
+        if reload == 'eager':
+            self._load(self.self)
+        elif reload == 'lazy':
+            self._mark_stale()
+
+    def _mark_stale(self):
+        # drop the loaded JSON and everything built from it, so reading any of it loads the resource again; what
+        # identifies the resource can't have changed, and is kept so that passing it to the client loads nothing
+        raw = self.__dict__.pop('raw', None) or {}
+        self._forget(raw)
+        for item in IDENTIFYING_PROPERTIES:
+            if item in raw:
+                self.__dict__[item] = raw[item]
+        self._stale = True
 
     def _url(self, ids):
         url = '{server}/rest/{rest_path}/{rest_api_version}/'.format(**self._options)
@@ -167,7 +231,7 @@ class Issue(Resource):
         if raw:
             self._parse_raw(raw)
 
-    def update(self, fields=None, **fieldargs):
+    def update(self, fields=None, reload=None, **fieldargs):
         """
         Update this issue on the server.
 
@@ -181,6 +245,7 @@ class Issue(Resource):
 
         :param fields: a dict containing field names and the values to use; if present, all other keyword arguments\
         will be ignored
+        :param reload: ``'eager'``, ``'lazy'`` or ``'never'``; see :py:meth:`Resource.update`
         """
         data = {}
         if fields is not None:
@@ -191,7 +256,31 @@ class Issue(Resource):
                 fields_dict[field] = fieldargs[field]
             data['fields'] = fields_dict
 
-        super(Issue, self).update(**data)
+        super(Issue, self).update(reload=reload, **data)
+
+    def save(self, reload=None):
+        """
+        Send the fields assigned on this issue since it was loaded to the server, e.g.::
+
+            issue.fields.summary = 'New summary'
+            issue.fields.priority = jira.priority('2')
+            issue.save()
+
+        Lists changed in place and properties of nested fields, such as ``issue.fields.timetracking.originalEstimate``,
+        count as assigned too (see :py:func:`changed_properties`). Only the fields whose values actually changed are
+        sent, and if none did, no request is made at all. Returns whether the issue was updated.
+
+        :param reload: ``'eager'``, ``'lazy'`` or ``'never'``; see :py:meth:`Resource.update`
+        """
+        fields = self.__dict__.get('fields')
+        changes = changed_properties(fields) if isinstance(fields, PropertyHolder) else {}
+        if not changes:
+            return False
+
+        self.update(fields=changes, reload=reload)
+        # without a reload the assigned values stay in place, and what was sent becomes what later saves compare against
+        mark_saved(fields, changes)
+        return True
 
     def delete(self, deleteSubtasks=False):
         """
@@ -219,7 +308,7 @@ class RemoteLink(Resource):
         if raw:
             self._parse_raw(raw)
 
-    def update(self, object, globalId=None, application=None, relationship=None):
+    def update(self, object, globalId=None, application=None, relationship=None, reload=None):
         """
         Update a RemoteLink. 'object' is required and should be
 
@@ -230,6 +319,7 @@ class RemoteLink(Resource):
         :param globalId: unique ID for the link (see the above link for details)
         :param application: application information for the link (see the above link for details)
         :param relationship: relationship description for the link (see the above link for details)
+        :param reload: ``'eager'``, ``'lazy'`` or ``'never'``; see :py:meth:`Resource.update`
         """
         data = {
             'object': object
@@ -241,7 +331,7 @@ class RemoteLink(Resource):
         if relationship is not None:
             data['relationship'] = relationship
 
-        super(RemoteLink, self).update(**data)
+        super(RemoteLink, self).update(reload=reload, **data)
 
 
 class Votes(Resource):
@@ -349,7 +439,7 @@ class Role(Resource):
         if raw:
             self._parse_raw(raw)
 
-    def update(self, users=None, groups=None):
+    def update(self, users=None, groups=None, reload=None):
         """
         Add the specified users or groups to this project role. One of ``users`` or ``groups`` must be specified.
 
@@ -357,6 +447,7 @@ class Role(Resource):
         :type users: string, list or tuple
         :param groups: a group or groups to add to the role
         :type groups: string, list or tuple
+        :param reload: ``'eager'``, ``'lazy'`` or ``'never'``; see :py:meth:`Resource.update`
         """
         if users is not None and isinstance(users, basestring):
             users = (users,)
@@ -371,7 +462,7 @@ class Role(Resource):
             }
         }
 
-        super(Role, self).update(**data)
+        super(Role, self).update(reload=reload, **data)
 
 
 class Resolution(Resource):
@@ -437,45 +528,308 @@ class Version(Resource):
         super(Version, self).delete(params)
 
 
+class PropertyHolder(object):
+    """
+    Attribute access to a dict of properties that isn't an addressable resource (it has no ``self`` link).
+
+    Like ``Resource``, the properties are read from the raw dict on demand. Every nested dict
+    in a response gets one of these, so the bookkeeping lives in slots and the instance ``__dict__`` is only
+    allocated once a property has actually been read.
+
+    Assigning a property leaves the raw dict alone; the name is remembered instead, so the changes can be found with
+    :py:func:`changed_properties`.
+    """
+
+    __slots__ = ('_raw', '_options', '_session', '_assigned', '__dict__')
+
+    def __init__(self, raw, options=None, session=None):
+        self._raw = raw
+        self._options = options
+        self._session = session
+
+    def __getattr__(self, item):
+        if item.startswith('__') or item in PropertyHolder.__slots__ or item not in self._raw:
+            raise AttributeError("'PropertyHolder' object has no attribute '{0}'".format(item))
+
+        value = materialize(self._raw[item], self._options, self._session)
+        if value is not self._raw[item]:
+            # caching a view isn't an assignment
+            self.__dict__[item] = value
+        return value
+
+    def __setattr__(self, item, value):
+        object.__setattr__(self, item, value)
+        if item not in PropertyHolder.__slots__:
+            try:
+                self._assigned.add(item)
+            except AttributeError:
+                self._assigned = set([item])
+
+    def __dir__(self):
+        return sorted(set(dir(type(self)) + self.__dict__.keys() + self._raw.keys()))
+
+
+def reload_policy(reload, options):
+    """
+    Check a reload policy given to a method that writes to the server, falling back to the ``reload`` option of the
+    client when it is ``None``.
+
+    :param reload: ``'eager'``, ``'lazy'``, ``'never'`` or ``None``
+    :param options: the options of the client
+    """
+    if reload is None:
+        reload = (options or {}).get('reload', 'eager')
+    if reload not in RELOAD_POLICIES:
+        raise ValueError('reload must be one of {0}, not {1!r}'.format(', '.join(RELOAD_POLICIES), reload))
+    return reload
+
+
+def changed_properties(holder):
+    """
+    Get a dict of the properties assigned on a ``PropertyHolder``, or read and changed in place, whose values differ
+    from its raw JSON, converted back to JSON. Resources are reduced to the reference JIRA expects for them, e.g.
+    ``{'id': '3'}`` for a priority or ``{'name': 'fred'}`` for a user, and a value counts as unchanged when it matches
+    the raw JSON in every key it has. A property missing from the raw JSON, e.g. because it wasn't among the fields
+    asked for, counts as changed whatever it is assigned.
+
+    Properties of nested ``PropertyHolder`` objects read from the raw JSON are followed too, and only the properties
+    that changed in them are included, e.g. ``{'timetracking': {'originalEstimate': '3h'}}``; the rest of a nested dict
+    often holds values JIRA only renders, like ``originalEstimateSeconds``, which it won't take back on edit.
+    """
+    items = set(getattr(holder, '_assigned', ()))
+    # lists are copied when read (see materialize) and nested holders are followed, so either may have changed in
+    # place without being assigned
+    items.update(item for item, value in holder.__dict__.iteritems() if isinstance(value, (list, PropertyHolder)))
+    changes = {}
+    for item in items:
+        value = holder.__dict__[item]
+        if isinstance(value, PropertyHolder) and value._raw is holder._raw.get(item):
+            nested = changed_properties(value)
+            if nested:
+                changes[item] = nested
+            continue
+
+        value = json_value(value)
+        if item not in holder._raw or not same_json(value, holder._raw[item]):
+            changes[item] = value
+    return changes
+
+
+def mark_saved(holder, changes):
+    """
+    Make the changes sent for a ``PropertyHolder`` the values its properties are compared against from now on, so that
+    :py:func:`changed_properties` no longer finds them. The raw JSON is replaced with an updated copy rather than
+    changed, and nested holders are updated in the same way.
+
+    :param holder: the ``PropertyHolder`` the changes were found on
+    :param changes: the changes as returned by :py:func:`changed_properties`
+    """
+    raw = dict(holder._raw)
+    raw.update(changes)
+    holder._raw = raw
+    holder._assigned = set()
+    for item, value in changes.iteritems():
+        nested = holder.__dict__.get(item)
+        if isinstance(nested, PropertyHolder) and isinstance(value, dict):
+            mark_saved(nested, value)
+            # a nested holder's changes only cover what changed in it, so keep the whole of its updated JSON
+            raw[item] = nested._raw
+
+
+def json_value(value):
+    """
+    Convert an attribute value back into the JSON to send to JIRA for it.
+    """
+    if isinstance(value, Resource):
+        for reference in ('id', 'name', 'key'):
+            if reference in value.raw:
+                return {reference: value.raw[reference]}
+        return {'self': value.self}
+    elif isinstance(value, PropertyHolder):
+        changes = changed_properties(value)
+        if not changes:
+            return value._raw
+        raw = dict(value._raw)
+        raw.update(changes)
+        return raw
+    elif isinstance(value, (tuple, list, set, frozenset)):
+        return [json_value(elem) for elem in value]
+    return value
+
+
+def same_json(value, raw):
+    """
+    Whether a JSON value to send to JIRA leaves the raw JSON already there as it is. Dicts match when the raw dict has
+    the same value for every key of the new one.
+    """
+    if isinstance(value, dict) and isinstance(raw, dict):
+        return all(key in raw and same_json(elem, raw[key]) for key, elem in value.iteritems())
+    if isinstance(value, list) and isinstance(raw, list):
+        return len(value) == len(raw) and all(same_json(elem, raw_elem) for elem, raw_elem in zip(value, raw))
+    return value == raw
+
+
+def materialize(value, options=None, session=None):
+    """
+    Convert a JSON value into the object exposed as an attribute: a ``Resource`` of the appropriate type for dicts
+    with a ``self`` link, a ``PropertyHolder`` for other dicts, a list of converted items for lists holding dicts, and
+    a copy of lists of plain values. Anything else is returned unchanged.
+
+    The objects built here are views that keep a reference to the dicts they wrap rather than a copy, so each value
+    parsed out of a response is only stored once, in the ``raw`` tree of the top-level resource. That tree may be
+    shared with other callers (see :py:func:`jira.cache.parsed_json`), so lists, which callers change in place, are
+    copied rather than handed out.
+    """
+    if isinstance(value, dict):
+        if 'self' in value:
+            identities = options.get('identity_map') if options else None
+            if identities:
+                return identities.resource(value, options, session)
+            return cls_for_resource(value['self'])(options, session, value)
+        return PropertyHolder(value, options, session)
+    elif isinstance(value, (tuple, list, set, frozenset)):
+        if not any(isinstance(elem, dict) for elem in value):
+            return value[:] if isinstance(value, list) else value
+        return [materialize(elem, options, session) if isinstance(elem, dict) else elem for elem in value]
+    return value
+
+
 def dict2resource(raw, top=None, options=None, session=None):
     """
-    Recursively walks a dict structure, transforming the properties into attributes
-    on a new ``Resource`` object of the appropriate type (if a ``self`` link is present)
-    or a ``PropertyHolder`` object (if no ``self`` link is present).
+    Transforms the properties of a dict structure into attributes on ``top``, or on a new ``PropertyHolder`` object
+    if ``top`` isn't given. Nested dicts become ``Resource`` objects of the appropriate type (if a ``self`` link is
+    present) or ``PropertyHolder`` objects (if no ``self`` link is present), whose own properties are only converted
+    when they are first read.
     """
     if top is None:
-        top = type('PropertyHolder', (object,), raw)
+        return PropertyHolder(raw, options, session)
 
-    seqs = tuple, list, set, frozenset
     for i, j in raw.iteritems():
-        if isinstance(j, dict):
-            if 'self' in j:
-                resource = cls_for_resource(j['self'])(options, session, j)
-                setattr(top, i, resource)
-            else:
-                setattr(top, i, dict2resource(j, options=options, session=session))
-        elif isinstance(j, seqs):
-            seq_list = []
-            for seq_elem in j:
-                if isinstance(seq_elem, dict):
-                    if 'self' in seq_elem:
-                        resource = cls_for_resource(seq_elem['self'])(options, session, seq_elem)
-                        seq_list.append(resource)
-                    else:
-                        seq_list.append(dict2resource(seq_elem, options=options, session=session))
-                else:
-                    seq_list.append(seq_elem)
-            setattr(top, i, seq_list)
-        else:
-            setattr(top, i, j)
+        setattr(top, i, materialize(j, options, session))
     return top
 
-resource_class_map = {
+
+class IdentityMap(object):
+    """
+    Makes every embedded resource with the same ``self`` link and the same JSON resolve to one shared Resource, for
+    as long as anything still refers to it. A client with the ``identity_map`` option set keeps one of these, so the
+    users, statuses, priorities, issue types and projects repeated across a large set of issues are each built once.
+
+    It also supplies the hook the client parses responses with (see :py:meth:`object_hook`), which deduplicates the
+    JSON itself before any resource is built.
+    """
+
+    def __init__(self):
+        self._resources = WeakValueDictionary()
+        self._lock = Lock()
+
+    def resource(self, raw, options, session):
+        """
+        Get the shared Resource for a dict with a ``self`` link, building it if there is none yet or the one there
+        was built from different JSON.
+
+        :param raw: the JSON of the resource
+        :param options: the options of the client the resource belongs to
+        :param session: the session of the client the resource belongs to
+        """
+        url = raw['self']
+        with self._lock:
+            resource = self._resources.get(url)
+            if resource is not None:
+                resource_raw = resource.__dict__.get('raw')
+                if resource_raw is raw or resource_raw == raw:
+                    return resource
+            resource = cls_for_resource(url)(options, session, raw)
+            self._resources[url] = resource
+            return resource
+
+    def object_hook(self):
+        """
+        Get a hook for :py:func:`json.loads` that deduplicates the JSON of one response as it is parsed: equal objects
+        with the same ``self`` link become one dict, and equal string values become one string. Each call returns a
+        new hook, so nothing is kept once the response has been parsed.
+        """
+        strings = {}
+        resources = {}
+
+        def hook(obj):
+            for key, value in obj.items():
+                if isinstance(value, basestring):
+                    obj[key] = strings.setdefault(value, value)
+            url = obj.get('self')
+            if url is None:
+                return obj
+            candidates = resources.setdefault(url, [])
+            for candidate in candidates:
+                if candidate == obj:
+                    return candidate
+            candidates.append(obj)
+            return obj
+        return hook
+
+
+def json_object_hook(options):
+    """
+    Get the hook to parse a response for a client with the given options with, or ``None`` if it has no identity map.
+    """
+    identities = options.get('identity_map') if options else None
+    if not identities:
+        return None
+    return identities.object_hook()
+
+class ResourceClassMap(dict):
+    """
+    Maps regular expressions over resource paths to the Resource subclasses that model them.
+
+    Any change to the map discards the compiled dispatcher used by :py:func:`cls_for_resource`, so new entries take
+    effect immediately. Patterns may look at the text of IDs, e.g. ``r'issue/\d+$'``, but only patterns written
+    like the built-in ones, with ``[^/]+`` standing for each ID, let :py:func:`cls_for_resource` serve URLs from its
+    cache of resource shapes.
+    """
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed()
+
+    def clear(self):
+        dict.clear(self)
+        self._changed()
+
+    def pop(self, *args):
+        value = dict.pop(self, *args)
+        self._changed()
+        return value
+
+    def popitem(self):
+        item = dict.popitem(self)
+        self._changed()
+        return item
+
+    def setdefault(self, key, default=None):
+        value = dict.setdefault(self, key, default)
+        self._changed()
+        return value
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self._changed()
+
+    def _changed(self):
+        global _resource_dispatcher
+        _resource_dispatcher = None
+        _resource_class_cache.clear()
+
+
+resource_class_map = ResourceClassMap({
     r'attachment/[^/]+$': Attachment,
     r'component/[^/]+$': Component,
     r'customFieldOption/[^/]+$': CustomFieldOption,
     r'dashboard/[^/]+$': Dashboard,
-    r'filter/[^/]$': Filter,
+    r'filter/[^/]+$': Filter,
     r'issue/[^/]+$': Issue,
     r'issue/[^/]+/comment/[^/]+$': Comment,
     r'issue/[^/]+/votes$': Votes,
@@ -492,13 +846,91 @@ resource_class_map = {
     r'status/[^/]+$': Status,
     r'user\?username.+$': User,
     r'version/[^/]+$': Version,
-}
+})
+
+# compiled alternation of every pattern in resource_class_map, the resource classes keyed by the name of the group
+# each pattern is captured in, and whether every pattern matches all URLs of a shape alike; rebuilt on demand after
+# the map changes
+_resource_dispatcher = None
+
+# resource classes already resolved, keyed by resource shape
+_resource_class_cache = {}
+
+# resource names are words like issue, issueLink or application-properties; IDs and keys have digits in them
+_RESOURCE_NAME = re.compile(r'[A-Za-z][A-Za-z_-]*$')
+
+
+def resource_shape(resource_literal):
+    """
+    Reduce the URL of a resource to the shape of its path below the last ``/rest/``, with the ID segments replaced by
+    ``{}``: ``http://jira/rest/api/2/issue/BULK-1/comment/10000`` becomes ``api/2/issue/{}/comment/{}``. Every
+    resource of the same type shares the same shape. Returns None for URLs outside the REST API, and for those whose
+    names and IDs don't alternate as expected.
+    """
+    path, sep, query = resource_literal.partition('?')
+    # the server may itself live below a path ending in /rest, so only the last /rest/ starts the REST API
+    head, rest, path = path.rpartition('/rest/')
+    if not rest:
+        return None
+
+    # the first two segments are the REST path and its version; after that names and IDs alternate
+    segments = path.split('/')
+    if not all(_RESOURCE_NAME.match(name) for name in segments[2::2]):
+        return None
+    for i in xrange(3, len(segments), 2):
+        segments[i] = '{}'
+    shape = '/'.join(segments)
+    if sep:
+        shape += '?' + query.partition('=')[0] + '={}'
+    return shape
+
+
+def _matches_by_shape(pattern):
+    # a pattern made of literal names and [^/]+ or .+ wildcards, whose names fall where resource_shape keeps them,
+    # matches either every URL of a shape or none of them
+    literal = pattern[:-1] if pattern.endswith('$') else pattern
+    for wildcard in ('[^/]+', '.+'):
+        literal = literal.replace(wildcard, '\0')
+    if not re.match(r'(?:[\w/=-]|\\\?|\0)*$', literal):
+        return False
+    shape = resource_shape('/rest/api/2/' + literal.replace('\\?', '?').replace('\0', '{}'))
+    return shape is not None and re.search(pattern, shape) is not None
+
+
+def _compile_dispatcher():
+    classes = {}
+    alternatives = []
+    for i, (pattern, cls) in enumerate(resource_class_map.iteritems()):
+        group = 'r{0}'.format(i)
+        classes[group] = cls
+        alternatives.append('(?P<{0}>{1})'.format(group, pattern))
+    by_shape = all(_matches_by_shape(pattern) for pattern in resource_class_map)
+    return re.compile('|'.join(alternatives)), classes, by_shape
 
 
 def cls_for_resource(resource_literal):
-    for resource in resource_class_map:
-        if re.search(resource, resource_literal):
-            return resource_class_map[resource]
-    else:
-        # generic Resource without specialized update/delete behavior
-        return Resource
+    """
+    Find the Resource subclass that models the resource at the given URL, or ``Resource`` itself if no entry in
+    ``resource_class_map`` matches it.
+
+    While every pattern in the map only tells URLs apart by their shape (see :py:func:`resource_shape`), the result
+    for each shape is computed once and then served from a cache. Otherwise each URL is matched in full.
+    """
+    global _resource_dispatcher
+
+    if _resource_dispatcher is None:
+        _resource_dispatcher = _compile_dispatcher()
+    pattern, classes, by_shape = _resource_dispatcher
+
+    shape = resource_shape(resource_literal) if by_shape else None
+    try:
+        return _resource_class_cache[shape]
+    except KeyError:
+        pass
+
+    match = pattern.search(resource_literal)
+    # generic Resource without specialized update/delete behavior
+    cls = classes[match.lastgroup] if match else Resource
+    if shape is not None:
+        _resource_class_cache[shape] = cls
+    return cls
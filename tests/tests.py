@@ -1,9 +1,21 @@
+import json
 import unittest
 import os
-
-from jira.client import JIRA
+import re
+import requests
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from jira.cache import MemoryCache, FileCache, CachingSession, CoalescingSession, parsed_json
+from jira.client import JIRA, AdaptivePageSize, keyset_jql, key_chunks, restrict_jql, order_by_position
+from jira.changefeed import ChangeFeed
+from jira.mirror import Mirror
 from jira.exceptions import JIRAError
-from jira.resources import Resource, cls_for_resource, Issue, Project, Role
+from jira.resources import Resource, cls_for_resource, resource_class_map, resource_shape, changed_properties, \
+    mark_saved, IdentityMap, Issue, Priority, Project, Role, Status, User, Comment, Filter, RemoteLink
 
 TEST_ROOT = os.path.dirname(__file__)
 TEST_ICON_PATH = os.path.join(TEST_ROOT, 'icon.png')
@@ -60,6 +72,321 @@ def find_by_id(seq, id):
             return seq_item
 
 
+class ClientOptionsTests(unittest.TestCase):
+
+    def test_clients_do_not_share_options(self):
+        jira_a = JIRA(options={'server': 'http://jira-a.example.com'})
+        jira_b = JIRA(options={'server': 'http://jira-b.example.com/jira/', 'rest_api_version': '3'})
+        self.assertEqual(jira_a._get_url('issue/BULK-1'), 'http://jira-a.example.com/rest/api/2/issue/BULK-1')
+        self.assertEqual(jira_b._get_url('issue/BULK-1'), 'http://jira-b.example.com/jira/rest/api/3/issue/BULK-1')
+        self.assertEqual(JIRA.DEFAULT_OPTIONS['server'], 'http://localhost:2990/jira')
+        self.assertEqual(JIRA.DEFAULT_OPTIONS['rest_api_version'], '2')
+
+    def test_session_options(self):
+        jira = JIRA(options={'timeout': 7.5, 'pool_maxsize': 32, 'keep_alive': False})
+        self.assertEqual(jira._session.timeout, 7.5)
+        self.assertEqual(jira._session.config['pool_maxsize'], 32)
+        self.assertEqual(jira._session.config['pool_connections'], 10)
+        self.assertFalse(jira._session.config['keep_alive'])
+
+    def test_search_post_threshold(self):
+        class RecordingSession(object):
+            def __init__(self):
+                self.methods = []
+
+            def request(self, method):
+                self.methods.append(method)
+                response = requests.models.Response()
+                response.status_code = 200
+                response._content = json.dumps({'startAt': 0, 'maxResults': 50, 'total': 0, 'issues': []})
+                return response
+
+            def get(self, url, **kwargs):
+                return self.request('GET')
+
+            def post(self, url, **kwargs):
+                return self.request('POST')
+
+        jira = JIRA(options={'search_post_threshold': 0})
+        jira._session = RecordingSession()
+        jira.search_issues('')
+        jira.search_issues('project=BULK')
+        jira._options['search_post_threshold'] = 12
+        jira.search_issues('project=BUL')
+        jira.search_issues('project=BULK')
+        jira._options['search_post_threshold'] = None
+        jira.search_issues('project=BULK')
+        self.assertEqual(jira._session.methods, ['POST', 'POST', 'GET', 'POST', 'GET'])
+
+    def test_get_url_leaves_options_alone(self):
+        jira = JIRA(options={'server': 'http://jira-a.example.com'})
+        options = dict(jira._options)
+        jira._get_url('issue/BULK-1')
+        self.assertEqual(jira._options, options)
+
+
+class AdaptivePageSizeTests(unittest.TestCase):
+
+    def page(self, count, maxResults=1000):
+        return {'startAt': 0, 'maxResults': maxResults, 'total': 5000, 'issues': [{}] * count}
+
+    def test_grows_toward_target_latency(self):
+        sizer = AdaptivePageSize(50, targetLatency=2.0)
+        sizer.page_received(self.page(50), 0.5)
+        self.assertEqual(sizer.pageSize, 100)
+        sizer.page_received(self.page(100), 1.6)
+        self.assertEqual(sizer.pageSize, 125)
+
+    def test_shrinks_toward_target_latency(self):
+        sizer = AdaptivePageSize(400, targetLatency=1.0)
+        sizer.page_received(self.page(400), 10.0)
+        self.assertEqual(sizer.pageSize, 200)
+
+    def test_tighter_target_wins(self):
+        sizer = AdaptivePageSize(100, targetLatency=10.0, targetBytes=50000)
+
+        class Response(object):
+            content = 'x' * 100000
+        sizer.response_received(Response())
+        sizer.page_received(self.page(100), 1.0)
+        self.assertEqual(sizer.pageSize, 50)
+
+    def test_honours_server_cap(self):
+        sizer = AdaptivePageSize(800, targetLatency=5.0)
+        sizer.page_received(self.page(500, maxResults=500), 0.5)
+        self.assertEqual(sizer.pageSize, 500)
+        sizer.page_received(self.page(500, maxResults=500), 0.5)
+        self.assertEqual(sizer.pageSize, 500)
+
+
+class ShardedSearchTests(unittest.TestCase):
+
+    def search(self, jql_str, startAt, maxResults, fields=None, expand=None, validateQuery=True, on_response=None):
+        ids = sorted(self.matching)
+        for low, high in re.findall(r'id >= (\d+) AND id <= (\d+)', jql_str):
+            ids = [i for i in ids if int(low) <= i <= int(high)]
+        for after in re.findall(r'id > (\d+)', jql_str):
+            ids = [i for i in ids if i > int(after)]
+        for before in re.findall(r'id < (\d+)', jql_str):
+            ids = [i for i in ids if i < int(before)]
+        if jql_str.endswith('DESC'):
+            ids.reverse()
+
+        self.searches += 1
+        if self.searches == 2:
+            # starts matching once the bounds of the matching IDs have been found
+            self.matching.add(150)
+        issues = [{'id': str(i), 'key': 'BULK-{0}'.format(i)} for i in ids[startAt:startAt + maxResults]]
+        return {'startAt': startAt, 'maxResults': maxResults, 'total': len(ids), 'issues': issues}
+
+    def test_iter_issues_sharded_counts_change_between_searches(self):
+        self.matching = set([100, 101, 102, 200])
+        self.searches = 0
+        jira = JIRA()
+        jira._search = self.search
+        issues = jira.iter_issues_sharded('project=BULK', shardSize=3, workers=2, raw=True)
+        self.assertEqual([issue['id'] for issue in issues], ['100', '101', '102', '150', '200'])
+
+
+class JqlTests(unittest.TestCase):
+
+    def test_restrict_jql_drops_order_by(self):
+        self.assertEqual(restrict_jql('project = BULK order by key', 'status = "Open"'),
+                         '(project = BULK) AND status = "Open"')
+        self.assertEqual(restrict_jql('', 'status = "Open"'), 'status = "Open"')
+
+    def test_restrict_jql_skips_quoted_order_by(self):
+        self.assertEqual(restrict_jql('summary ~ "sort order by date" and project = BULK', 'status = "Open"'),
+                         '(summary ~ "sort order by date" and project = BULK) AND status = "Open"')
+        self.assertEqual(restrict_jql("summary ~ 'order by' ORDER BY key", 'status = "Open"'),
+                         '(summary ~ \'order by\') AND status = "Open"')
+        self.assertIsNone(order_by_position('summary ~ "say \\"order by\\" twice"'))
+        ChangeFeed(None, 'summary ~ "sort order by date"')
+
+    def test_key_chunks_escape_keys(self):
+        self.assertEqual(list(key_chunks(['BULK-1', 'BULK-"2', 'BULK\\'], 2)), [
+            (('BULK-1', 'BULK-"2'), 'key in ("BULK-1", "BULK-\\"2")'),
+            (('BULK\\',), 'key in ("BULK\\\\")'),
+        ])
+
+    def test_count_issues_by_escapes_values(self):
+        jira = JIRA()
+        searched = []
+        jira.count_issues = lambda jql_str: searched.append(jql_str) or 0
+        jira.count_issues_by('project = BULK', 'component', ['say "hi"', 'C:\\', None], workers=1)
+        self.assertEqual(searched, ['(project = BULK) AND component = "say \\"hi\\""',
+                                    '(project = BULK) AND component = "C:\\\\"',
+                                    '(project = BULK) AND component is EMPTY'])
+
+    def test_keyset_jql(self):
+        self.assertEqual(keyset_jql('project = BULK'), '(project = BULK) ORDER BY id ASC')
+        self.assertEqual(keyset_jql('project = BULK', 10010), '(project = BULK) AND id > 10010 ORDER BY id ASC')
+        self.assertEqual(keyset_jql('', 10010, descending=True), 'id < 10010 ORDER BY id DESC')
+
+
+class ValidatingSession(object):
+    # answers like a server that sends ETags and honours If-None-Match
+    headers = {}
+
+    def __init__(self, response_headers, body='{"key": "BULK-1"}'):
+        self.response_headers = response_headers
+        self.body = body
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        self.requests.append(headers)
+        response = requests.models.Response()
+        response.url = url
+        response.headers = dict(self.response_headers)
+        if headers.get('If-None-Match') == self.response_headers.get('etag'):
+            response.status_code = 304
+        else:
+            response.status_code = 200
+            response._content = self.body
+        return response
+
+
+class CacheTests(unittest.TestCase):
+
+    def test_memory_cache_expires(self):
+        cache = MemoryCache()
+        cache.set('fresh', [1], 60)
+        cache.set('stale', [2], -1)
+        self.assertEqual(cache.get('fresh'), [1])
+        self.assertIsNone(cache.get('stale'))
+        self.assertIsNone(cache.get('missing'))
+
+    def test_memory_cache_drops_least_recently_used(self):
+        cache = MemoryCache(maxsize=2)
+        cache.set('a', 1, 60)
+        cache.set('b', 2, 60)
+        cache.get('a')
+        cache.set('c', 3, 60)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_memory_cache_returns_copies(self):
+        cache = MemoryCache()
+        value = [{'name': 'Open'}]
+        cache.set('status', value, 60)
+        value[0]['name'] = 'Changed'
+        cache.get('status')[0]['name'] = 'Changed'
+        self.assertEqual(cache.get('status'), [{'name': 'Open'}])
+
+    def test_caching_session_revalidates(self):
+        session = CachingSession(ValidatingSession({'etag': '"1"'}))
+        first = session.get('http://localhost:2990/jira/rest/api/2/issue/BULK-1')
+        second = session.get('http://localhost:2990/jira/rest/api/2/issue/BULK-1')
+        self.assertEqual(session._session.requests[1]['If-None-Match'], '"1"')
+        self.assertIs(second, first)
+        # parsed once, but each caller gets its own copy
+        self.assertEqual(parsed_json(second), parsed_json(first))
+        self.assertIsNot(parsed_json(second), parsed_json(first))
+
+    def test_caching_session_keeps_changes_out_of_shared_json(self):
+        jira = JIRA()
+        jira._session = CachingSession(ValidatingSession({'etag': '"1"'},
+            '{"self": "http://localhost:2990/jira/rest/api/2/issue/10001", "key": "BULK-1", '
+            '"fields": {"labels": ["a"]}}'))
+        jira.issue('BULK-1').fields.labels.append('b')
+        issue = jira.issue('BULK-1')
+        self.assertEqual(jira._session._session.requests[1]['If-None-Match'], '"1"')
+        self.assertEqual(issue.fields.labels, ['a'])
+
+    def test_shared_responses_give_each_caller_its_own_json(self):
+        jira = JIRA()
+        jira._session = CachingSession(ValidatingSession({'etag': '"1"'},
+            '{"transitions": [{"id": "1", "name": "Close"}], "comments": [{"id": "1", "body": "First"}]}'))
+        jira.transitions('BULK-1').pop()
+        self.assertEqual(jira.transitions('BULK-1'), [{'id': '1', 'name': 'Close'}])
+        jira.comments('BULK-1', raw=True)[0]['body'] = 'Changed'
+        self.assertEqual(jira.comments('BULK-1', raw=True)[0]['body'], 'First')
+        self.assertEqual(jira._session._session.requests[1]['If-None-Match'], '"1"')
+
+        class SlowSession(object):
+            def get(self, url, params=None, headers=None, **kwargs):
+                time.sleep(0.2)
+                response = requests.models.Response()
+                response.status_code = 200
+                response._content = '{"transitions": [{"id": "1", "name": "Close"}]}'
+                return response
+
+        jira._session = CoalescingSession(SlowSession())
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(jira.transitions('BULK-1'))) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results[0].pop()
+        self.assertEqual(results[1:], [[{'id': '1', 'name': 'Close'}]] * 3)
+
+    def test_caching_session_honours_no_store(self):
+        session = CachingSession(ValidatingSession({'etag': '"1"', 'cache-control': 'no-cache, no-store'}))
+        session.get('http://localhost:2990/jira/rest/api/2/issue/BULK-1')
+        session.get('http://localhost:2990/jira/rest/api/2/issue/BULK-1')
+        self.assertNotIn('If-None-Match', session._session.requests[1])
+
+    def test_coalescing_session_shares_concurrent_requests(self):
+        class SlowSession(object):
+            calls = 0
+
+            def get(self, url, params=None, headers=None, **kwargs):
+                SlowSession.calls += 1
+                time.sleep(0.2)
+                return requests.models.Response()
+
+        url = 'http://localhost:2990/jira/rest/api/2/project/BULK'
+        session = CoalescingSession(SlowSession())
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(session.get(url))) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(SlowSession.calls, 1)
+        self.assertEqual(len(responses), 8)
+        self.assertEqual(len(set(id(response) for response in responses)), 1)
+
+        session.get(url)
+        self.assertEqual(SlowSession.calls, 2)
+
+    def test_file_cache(self):
+        path = tempfile.mkdtemp()
+        try:
+            cache = FileCache(path)
+            cache.set('server status', [{'name': 'Open'}], 60)
+            cache.set('server field', [], 60)
+            self.assertEqual(FileCache(path).get('server status'), [{'name': 'Open'}])
+            cache.invalidate('server status')
+            self.assertIsNone(cache.get('server status'))
+            self.assertEqual(cache.get('server field'), [])
+            cache.invalidate()
+            self.assertEqual(os.listdir(path), [])
+        finally:
+            shutil.rmtree(path)
+
+    def test_file_cache_replaces_without_posix_rename(self):
+        def windows_rename(source, target):
+            if os.path.exists(target):
+                raise OSError(17, 'File exists')
+            posix_rename(source, target)
+
+        path = tempfile.mkdtemp()
+        posix_rename = os.rename
+        os.rename = windows_rename
+        try:
+            cache = FileCache(path)
+            cache.set('server status', [{'name': 'Open'}], 60)
+            cache.set('server status', [{'name': 'Closed'}], 60)
+            self.assertEqual(cache.get('server status'), [{'name': 'Closed'}])
+            self.assertEqual(len(os.listdir(path)), 1)
+        finally:
+            os.rename = posix_rename
+            shutil.rmtree(path)
+
+
 class UniversalResourceTests(unittest.TestCase):
 
     def setUp(self):
@@ -103,6 +430,245 @@ class ResourceTests(unittest.TestCase):
         self.assertEqual(cls_for_resource('http://localhost:2990/jira/rest/api/2/project/BULK'), Project)
         self.assertEqual(cls_for_resource('http://imaginary-jira.com/rest/api/2/project/IMG/role/10002'), Role)
         self.assertEqual(cls_for_resource('http://customized-jira.com/rest/plugin-resource/4.5/json/getMyObject'), Resource)
+        self.assertEqual(cls_for_resource('http://localhost:2990/jira/rest/api/2/user?username=fred'), User)
+        self.assertEqual(cls_for_resource('http://localhost:2990/jira/rest/api/2/issue/10010/comment/10000'), Comment)
+        self.assertEqual(cls_for_resource('http://localhost:2990/jira/rest/api/2/filter/10000'), Filter)
+
+    def test_resource_shape(self):
+        self.assertEqual(resource_shape('http://localhost:2990/jira/rest/api/2/issue/BULK-1/comment/10000'),
+                         'api/2/issue/{}/comment/{}')
+        self.assertEqual(resource_shape('http://localhost:2990/jira/rest/api/2/user?username=fred'),
+                         'api/2/user?username={}')
+        self.assertIsNone(resource_shape('http://localhost:2990/jira/secure/Dashboard.jspa'))
+        self.assertIsNone(resource_shape('http://localhost:2990/jira/rest/api/2/issue/BULK-1/10000'))
+
+    def test_cls_for_resource_with_rest_context_path(self):
+        self.assertEqual(resource_shape('http://localhost:2990/rest/rest/api/2/issue/1'), 'api/2/issue/{}')
+        self.assertEqual(cls_for_resource('http://localhost:2990/rest/rest/api/2/issue/1'), Issue)
+        self.assertEqual(cls_for_resource('http://localhost:2990/rest/rest/api/2/project/1'), Project)
+        self.assertEqual(cls_for_resource('http://localhost:2990/rest/rest/api/2/issue/10010/comment/10000'), Comment)
+
+    def test_cls_for_resource_sees_new_map_entries(self):
+        url = 'http://localhost:2990/jira/rest/api/2/issue/10010/remotelink/10000'
+        self.assertEqual(cls_for_resource(url), Resource)
+        resource_class_map[r'issue/[^/]+/remotelink/[^/]+$'] = RemoteLink
+        try:
+            self.assertEqual(cls_for_resource(url), RemoteLink)
+        finally:
+            del resource_class_map[r'issue/[^/]+/remotelink/[^/]+$']
+        self.assertEqual(cls_for_resource(url), Resource)
+
+    def test_cls_for_resource_matches_id_text(self):
+        base = 'http://localhost:2990/jira/rest/api/2/'
+        resource_class_map[r'issue/[A-Z]+-\d+/remotelink/[^/]+$'] = RemoteLink
+        resource_class_map[r'project/BULK/role$'] = Role
+        try:
+            self.assertEqual(cls_for_resource(base + 'issue/10010/remotelink/10000'), Resource)
+            self.assertEqual(cls_for_resource(base + 'issue/BULK-1/remotelink/10000'), RemoteLink)
+            self.assertEqual(cls_for_resource(base + 'project/IMG/role'), Resource)
+            self.assertEqual(cls_for_resource(base + 'project/BULK/role'), Role)
+        finally:
+            del resource_class_map[r'issue/[A-Z]+-\d+/remotelink/[^/]+$']
+            del resource_class_map[r'project/BULK/role$']
+        self.assertEqual(cls_for_resource(base + 'issue/BULK-1/remotelink/10000'), Resource)
+
+    def test_attributes_materialized_on_first_access(self):
+        raw = {
+            'self': 'http://localhost:2990/jira/rest/api/2/issue/10000',
+            'key': 'BULK-1',
+            'fields': {
+                'summary': 'Lazy issue',
+                'status': {'self': 'http://localhost:2990/jira/rest/api/2/status/1', 'name': 'Open'},
+            }
+        }
+        issue = Issue(JIRA.DEFAULT_OPTIONS, None, raw)
+        self.assertNotIn('fields', issue.__dict__)
+        self.assertEqual(issue.key, 'BULK-1')
+        self.assertEqual(issue.fields.summary, 'Lazy issue')
+        self.assertIsInstance(issue.fields.status, Status)
+        self.assertEqual(issue.fields.status.name, 'Open')
+        self.assertFalse(hasattr(issue.fields, 'reporter'))
+        self.assertIn('summary', dir(issue.fields))
+
+    def test_attributes_are_views_over_raw(self):
+        raw = {
+            'self': 'http://localhost:2990/jira/rest/api/2/issue/10000',
+            'key': 'BULK-1',
+            'fields': {
+                'labels': ['one', 'two'],
+                'status': {'self': 'http://localhost:2990/jira/rest/api/2/status/1', 'name': 'Open'},
+            }
+        }
+        issue = Issue(JIRA.DEFAULT_OPTIONS, None, raw)
+        # lists are copied, so changing one never changes the JSON it came from
+        self.assertEqual(issue.fields.labels, raw['fields']['labels'])
+        self.assertIsNot(issue.fields.labels, raw['fields']['labels'])
+        self.assertIs(issue.fields.labels, issue.fields.labels)
+        self.assertIs(issue.fields.status.raw, raw['fields']['status'])
+        self.assertNotIn('key', issue.__dict__)
+
+    def test_identity_map_shares_embedded_resources(self):
+        options = dict(JIRA.DEFAULT_OPTIONS, identity_map=IdentityMap())
+        status = lambda name: {'self': 'http://localhost:2990/jira/rest/api/2/status/1', 'name': name}
+        issues = [Issue(options, None, {'self': 'http://localhost:2990/jira/rest/api/2/issue/{0}'.format(10000 + i),
+                                        'fields': {'status': status('Open')}}) for i in range(3)]
+        self.assertIs(issues[0].fields.status, issues[1].fields.status)
+        self.assertIs(issues[0].fields.status, issues[2].fields.status)
+
+        renamed = Issue(options, None, {'self': 'http://localhost:2990/jira/rest/api/2/issue/10003',
+                                        'fields': {'status': status('Reopened')}})
+        self.assertEqual(renamed.fields.status.name, 'Reopened')
+        self.assertEqual(issues[0].fields.status.name, 'Open')
+
+    def test_changed_properties(self):
+        raw = {
+            'self': 'http://localhost:2990/jira/rest/api/2/issue/10000',
+            'fields': {
+                'summary': 'Unchanged',
+                'labels': ['one'],
+                'priority': {'self': 'http://localhost:2990/jira/rest/api/2/priority/3', 'id': '3', 'name': 'Major'},
+            }
+        }
+        issue = Issue(JIRA.DEFAULT_OPTIONS, None, raw)
+        issue.fields.summary = 'Unchanged'
+        issue.fields.priority = issue.fields.priority
+        self.assertEqual(changed_properties(issue.fields), {})
+        self.assertFalse(issue.save())
+
+        issue.fields.labels = ['one', 'two']
+        issue.fields.priority = Priority(JIRA.DEFAULT_OPTIONS, None, {
+            'self': 'http://localhost:2990/jira/rest/api/2/priority/2', 'id': '2', 'name': 'Critical'})
+        self.assertEqual(changed_properties(issue.fields), {'labels': ['one', 'two'], 'priority': {'id': '2'}})
+        self.assertEqual(raw['fields']['labels'], ['one'])
+
+    def test_save_without_reload_compares_against_sent_values(self):
+        class RecordingSession(object):
+            def __init__(self):
+                self.sent = []
+
+            def put(self, url, data=None, **kwargs):
+                self.sent.append(json.loads(data))
+                response = requests.models.Response()
+                response.status_code = 204
+                return response
+
+        raw = {'self': 'http://localhost:2990/jira/rest/api/2/issue/10000', 'fields': {'summary': 'A'}}
+        session = RecordingSession()
+        issue = Issue(dict(JIRA.DEFAULT_OPTIONS, reload='never'), session, raw)
+        issue.fields.summary = 'B'
+        self.assertTrue(issue.save())
+        self.assertFalse(issue.save())
+        issue.fields.summary = 'A'
+        self.assertTrue(issue.save())
+        self.assertEqual(session.sent, [{'fields': {'summary': 'B'}}, {'fields': {'summary': 'A'}}])
+        self.assertEqual(raw['fields']['summary'], 'A')
+
+    def test_lazy_update_keeps_key_and_id(self):
+        class RecordingSession(object):
+            def __init__(self):
+                self.loaded = []
+
+            def put(self, url, data=None, **kwargs):
+                response = requests.models.Response()
+                response.status_code = 204
+                return response
+
+            def get(self, url, **kwargs):
+                self.loaded.append(url)
+                response = requests.models.Response()
+                response.status_code = 200
+                response._content = json.dumps(dict(raw, fields={'summary': 'B'}))
+                return response
+
+        raw = {'self': 'http://localhost:2990/jira/rest/api/2/issue/10000', 'id': '10000', 'key': 'BULK-1',
+               'fields': {'summary': 'A'}}
+        session = RecordingSession()
+        issue = Issue(JIRA.DEFAULT_OPTIONS, session, raw)
+        issue.update(summary='B', reload='lazy')
+        self.assertEqual((issue.key, issue.id, issue.self), ('BULK-1', '10000', raw['self']))
+        self.assertEqual(session.loaded, [])
+        self.assertEqual(issue.fields.summary, 'B')
+        self.assertEqual(session.loaded, [raw['self']])
+        self.assertNotIn('key', issue.__dict__)
+
+    def test_changed_properties_missing_and_nested_fields(self):
+        raw = {'self': 'http://localhost:2990/jira/rest/api/2/issue/10000', 'fields': {
+            'summary': 'Only field loaded',
+            'timetracking': {
+                'originalEstimate': '2h',
+                'remainingEstimate': '1h',
+                'timeSpent': '1h',
+                'originalEstimateSeconds': 7200,
+                'remainingEstimateSeconds': 3600,
+                'timeSpentSeconds': 3600,
+            },
+        }}
+        issue = Issue(JIRA.DEFAULT_OPTIONS, None, raw)
+        issue.fields.assignee = None
+        issue.fields.timetracking.originalEstimate = '3h'
+        self.assertEqual(changed_properties(issue.fields), {
+            'assignee': None,
+            'timetracking': {'originalEstimate': '3h'},
+        })
+        self.assertEqual(raw['fields']['timetracking']['originalEstimate'], '2h')
+
+        mark_saved(issue.fields, changed_properties(issue.fields))
+        self.assertEqual(changed_properties(issue.fields), {})
+        self.assertEqual(issue.fields.timetracking.remainingEstimate, '1h')
+        issue.fields.timetracking.originalEstimate = '2h'
+        self.assertEqual(changed_properties(issue.fields), {'timetracking': {'originalEstimate': '2h'}})
+
+    def test_changed_properties_lists_changed_in_place(self):
+        raw = {'self': 'http://localhost:2990/jira/rest/api/2/issue/10000', 'fields': {'labels': ['one']}}
+        issue = Issue(JIRA.DEFAULT_OPTIONS, None, raw)
+        labels = issue.fields.labels
+        labels.append('two')
+        issue.fields.labels = labels
+        self.assertEqual(changed_properties(issue.fields), {'labels': ['one', 'two']})
+
+        issue = Issue(JIRA.DEFAULT_OPTIONS, None, raw)
+        self.assertEqual(changed_properties(issue.fields), {})
+        issue.fields.labels.append('three')
+        self.assertEqual(changed_properties(issue.fields), {'labels': ['one', 'three']})
+        self.assertEqual(raw['fields']['labels'], ['one'])
+
+    def test_identity_map_object_hook(self):
+        payload = json.dumps({'issues': [
+            {'key': 'BULK-{0}'.format(i), 'fields': {
+                'status': {'self': 'http://localhost:2990/jira/rest/api/2/status/1', 'name': 'Open'},
+                'resolution': 'Fixed',
+            }} for i in range(3)]})
+        issues = json.loads(payload, object_hook=IdentityMap().object_hook())['issues']
+        self.assertIs(issues[0]['fields']['status'], issues[2]['fields']['status'])
+        self.assertIs(issues[0]['fields']['resolution'], issues[1]['fields']['resolution'])
+        self.assertIsNot(issues[0]['fields'], issues[1]['fields'])
+
+
+class ExecutorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.jira = get_jira_admin_auth()
+
+    def test_submit(self):
+        with self.jira.executor(max_workers=4) as executor:
+            futures = [executor.submit('issue', key) for key in ('BULK-1', 'BULK-2', 'BULK-3')]
+            issues = [future.get() for future in futures]
+        self.assertEqual([issue.key for issue in issues], ['BULK-1', 'BULK-2', 'BULK-3'])
+
+    def test_submit_callable_with_kwargs(self):
+        with self.jira.executor(max_workers=2) as executor:
+            issue = executor.submit(self.jira.issue, 'BULK-2', fields='summary').get()
+        self.assertEqual(issue.fields.summary, 'Version 1.1.1 cheese issue')
+
+    def test_map(self):
+        with self.jira.executor(max_workers=4) as executor:
+            watchers = list(executor.map('watchers', ('BULK-1', 'BULK-2')))
+        self.assertEqual(len(watchers), 2)
+
+    def test_future_raises_call_error(self):
+        with self.jira.executor(max_workers=2) as executor:
+            future = executor.submit('issue', 'BULK-99999')
+            self.assertRaises(JIRAError, future.get)
 
 
 class ApplicationPropertiesTests(unittest.TestCase):
@@ -247,6 +813,15 @@ class FieldsTests(unittest.TestCase):
         fields = self.jira.fields()
         self.assertEqual(len(fields), 63)
 
+    def test_fields_cached(self):
+        jira = get_jira_admin_auth()
+        jira._cache = MemoryCache()
+        self.assertEqual(jira.fields(), self.jira.fields())
+        jira._session = None  # any request would now fail
+        self.assertEqual(len(jira.fields()), 63)
+        jira.invalidate_cache('field')
+        self.assertRaises(AttributeError, jira.fields)
+
 
 class FilterTests(unittest.TestCase):
 
@@ -304,6 +879,55 @@ class IssueTests(unittest.TestCase):
         self.assertTrue(hasattr(issue, 'schema'))
         self.assertFalse(hasattr(issue, 'changelog'))
 
+    def test_issues(self):
+        issues = self.jira.issues(['BULK-3', 'BULK-1', 'BULK-2'])
+        self.assertEqual([issue.key for issue in issues], ['BULK-3', 'BULK-1', 'BULK-2'])
+        self.assertEqual(issues[2].fields.summary, 'Version 1.1.1 cheese issue')
+
+    def test_issues_chunked(self):
+        keys = ['BULK-{0}'.format(i) for i in range(1, 31)]
+        issues = self.jira.issues(keys, fields='summary', chunkSize=7)
+        self.assertEqual([issue.key for issue in issues], keys)
+
+    def test_issues_missing_keys(self):
+        issues = self.jira.issues(['BULK-1', 'BULK-99999', 'BULK-2'])
+        self.assertEqual(issues[0].key, 'BULK-1')
+        self.assertIsNone(issues[1])
+        self.assertEqual(issues[2].key, 'BULK-2')
+
+    def test_issues_moved_keys(self):
+        class MovedIssueSession(object):
+            # answers like a server where OLD-1 has been moved to BULK-1
+            moved = {'self': 'http://localhost:2990/jira/rest/api/2/issue/10001', 'id': '10001', 'key': 'BULK-1'}
+
+            def get(self, url, params=None, headers=None, **kwargs):
+                response = requests.models.Response()
+                response.url = url
+                response.status_code = 200
+                if url.endswith('/search'):
+                    issues = [self.moved] if 'OLD-1' in params['jql'] else []
+                    response._content = json.dumps({'startAt': 0, 'maxResults': 50, 'total': len(issues),
+                                                    'issues': issues})
+                elif url.endswith('/issue/OLD-1'):
+                    response._content = json.dumps(self.moved)
+                else:
+                    response.status_code = 404
+                    response._content = '{"errorMessages": ["Issue Does Not Exist"]}'
+                return response
+
+        jira = JIRA()
+        jira._session = MovedIssueSession()
+        issues = jira.issues(['OLD-1', 'NOPE-1'])
+        self.assertEqual(issues[0].key, 'BULK-1')
+        self.assertIsNone(issues[1])
+
+    def test_issues_quoted_keys(self):
+        issues = self.jira.issues(['BULK-1', 'BULK-"2', 'BULK\\', 'BULK-3'])
+        self.assertEqual(issues[0].key, 'BULK-1')
+        self.assertIsNone(issues[1])
+        self.assertIsNone(issues[2])
+        self.assertEqual(issues[3].key, 'BULK-3')
+
     def test_create_issue_with_fieldargs(self):
         issue = self.jira.create_issue(project={'key': 'BULK'}, summary='Test issue created',
                 description='blahery', issuetype={'name': 'Bug'}, customfield_10540={'key': 'XSS'})
@@ -344,6 +968,21 @@ class IssueTests(unittest.TestCase):
         self.assertTrue(hasattr(issue, 'self'))
         self.assertFalse(hasattr(issue, 'fields'))
 
+    def test_save(self):
+        issue = self.jira.create_issue(project={'key': 'BULK'}, summary='Test issue for saving',
+            description='Will be saved shortly', issuetype={'name': 'Bug'})
+        self.assertFalse(issue.save())
+        issue.fields.summary = 'Test issue for saving'
+        issue.fields.issuetype = {'name': 'Bug'}
+        self.assertFalse(issue.save())
+
+        issue.fields.summary = 'Saved summary'
+        self.assertTrue(issue.save())
+        self.assertEqual(issue.fields.summary, 'Saved summary')
+        self.assertEqual(issue.fields.description, 'Will be saved shortly')
+        self.assertEqual(self.jira.issue(issue.key).fields.summary, 'Saved summary')
+        issue.delete()
+
     def test_update_with_fieldargs(self):
         issue = self.jira.create_issue(project={'key': 'BULK'}, summary='Test issue for updating',
             description='Will be updated shortly', issuetype={'name': 'Bug'}, customfield_10540={'key': 'XSS'})
@@ -354,6 +993,22 @@ class IssueTests(unittest.TestCase):
         self.assertEqual(issue.fields.customfield_10540.key, 'XSS')
         self.assertEqual(issue.fields.project.key, 'BULK')
 
+    def test_update_reload_policies(self):
+        issue = self.jira.create_issue(project={'key': 'BULK'}, summary='Test issue for reloading',
+            description='Will be updated shortly', issuetype={'name': 'Bug'}, reload='lazy')
+        self.assertTrue(issue.key.startswith('BULK-'))
+        self.assertEqual(issue.fields.summary, 'Test issue for reloading')
+
+        issue.update(summary='Not reloaded', reload='never')
+        self.assertEqual(issue.fields.summary, 'Test issue for reloading')
+        issue.update(summary='Reloaded later', reload='lazy')
+        self.assertFalse('raw' in issue.__dict__)
+        self.assertEqual(issue.fields.summary, 'Reloaded later')
+        self.assertEqual(issue.fields.description, 'Will be updated shortly')
+        self.assertRaises(ValueError, issue.update, summary='Never sent', reload='sometimes')
+        self.assertEqual(self.jira.issue(issue.key).fields.summary, 'Reloaded later')
+        issue.delete()
+
     def test_update_with_fielddict(self):
         issue = self.jira.create_issue(project={'key': 'BULK'}, summary='Test issue for updating',
             description='Will be updated shortly', issuetype={'name': 'Bug'}, customfield_10540={'key': 'XSS'})
@@ -1016,6 +1671,79 @@ class SearchTests(unittest.TestCase):
         self.assertFalse(hasattr(issues[0].fields, 'reporter'))
         self.assertFalse(hasattr(issues[0].fields, 'progress'))
 
+    def test_iter_issues(self):
+        all_issues = self.jira.search_issues('project=BULK', maxResults=500)
+        issues = list(self.jira.iter_issues('project=BULK', pageSize=25))
+        self.assertEqual(len(issues), len(all_issues))
+        self.assertEqual([issue.key for issue in issues], [issue.key for issue in all_issues])
+
+    def test_iter_issues_startAt(self):
+        issues = list(self.jira.iter_issues('project=BULK', startAt=90, pageSize=5))
+        self.assertGreaterEqual(len(issues), 12)
+
+    def test_iter_issues_workers(self):
+        serial = [issue.key for issue in self.jira.iter_issues('project=BULK', pageSize=10)]
+        parallel = [issue.key for issue in self.jira.iter_issues('project=BULK', pageSize=10, workers=4)]
+        self.assertEqual(parallel, serial)
+
+    def test_search_issues_raw(self):
+        issues = self.jira.search_issues('project=BULK', maxResults=5, raw=True)
+        self.assertEqual(len(issues), 5)
+        for issue in issues:
+            self.assertIsInstance(issue, dict)
+            self.assertTrue(issue['key'].startswith('BULK'))
+
+    def test_iter_issues_raw(self):
+        keys = [issue['key'] for issue in self.jira.iter_issues('project=BULK', pageSize=25, raw=True)]
+        self.assertEqual(keys, [issue.key for issue in self.jira.iter_issues('project=BULK', pageSize=25)])
+
+    def test_search_issues_long_jql(self):
+        # long enough to be sent with POST
+        jql = 'key in ({0})'.format(', '.join('"BULK-{0}"'.format(i) for i in range(1, 101)))
+        self.assertGreater(len(jql), self.jira._options['search_post_threshold'])
+        issues = self.jira.search_issues(jql, maxResults=100, fields='summary')
+        self.assertEqual(len(issues), 100)
+        self.assertTrue(hasattr(issues[0].fields, 'summary'))
+        self.assertFalse(hasattr(issues[0].fields, 'reporter'))
+
+    def test_count_issues(self):
+        all_issues = self.jira.search_issues('project=BULK', maxResults=500)
+        self.assertEqual(self.jira.count_issues('project=BULK'), len(all_issues))
+
+    def test_count_issues_by(self):
+        counts = self.jira.count_issues_by('project=BULK order by key', 'status', ('Open', 'Closed'))
+        self.assertEqual(set(counts), set(['Open', 'Closed']))
+        self.assertEqual(counts['Open'], self.jira.count_issues('project=BULK and status = "Open"'))
+
+    def test_iter_issues_keyset(self):
+        by_offset = [issue.key for issue in self.jira.iter_issues('project=BULK order by id asc', pageSize=10)]
+        by_keyset = [issue.key for issue in self.jira.iter_issues('project=BULK', pageSize=10, keyset=True)]
+        self.assertEqual(by_keyset, by_offset)
+
+    def test_iter_issues_adaptive(self):
+        fixed = [issue.key for issue in self.jira.iter_issues('project=BULK', pageSize=10)]
+        adaptive = [issue.key for issue in self.jira.iter_issues('project=BULK', pageSize=10, targetLatency=0.5)]
+        self.assertEqual(adaptive, fixed)
+
+    def test_iter_issues_adaptive_rejects_workers(self):
+        self.assertRaises(ValueError, self.jira.iter_issues, 'project=BULK', workers=4, targetLatency=0.5)
+
+    def test_iter_issues_sharded(self):
+        by_keyset = [issue.key for issue in self.jira.iter_issues('project=BULK', pageSize=50, keyset=True)]
+        sharded = [issue.key for issue in self.jira.iter_issues_sharded('project=BULK', shardSize=10, workers=4)]
+        self.assertEqual(sharded, by_keyset)
+
+    def test_iter_issues_sharded_is_lazy(self):
+        self.jira._session = None
+        issues = self.jira.iter_issues_sharded('project=BULK')
+        self.assertRaises(AttributeError, next, issues)
+
+    def test_iter_issues_sharded_rejects_order_by(self):
+        self.assertRaises(ValueError, self.jira.iter_issues_sharded, 'project=BULK order by created')
+
+    def test_iter_issues_keyset_rejects_order_by(self):
+        self.assertRaises(ValueError, self.jira.iter_issues, 'project=BULK order by created', keyset=True)
+
     @unittest.skip('Skipping until I know how to handle the expandos')
     def test_search_issues_expandos(self):
         issues = self.jira.search_issues('key=BULK-1', expand=('names'))
@@ -1023,6 +1751,96 @@ class SearchTests(unittest.TestCase):
         self.assertFalse(hasattr(issues[0], 'schema'))
 
 
+class ChangeFeedTests(unittest.TestCase):
+
+    def setUp(self):
+        self.jira = get_jira_admin_auth()
+        self.issue = self.jira.create_issue(project={'key': 'BULK'}, summary='Test issue for the change feed',
+            issuetype={'name': 'Bug'})
+
+    def tearDown(self):
+        self.issue.delete()
+
+    def test_poll(self):
+        feed = ChangeFeed(self.jira, 'project=BULK', since=datetime.now() - timedelta(days=1))
+        self.assertIn(self.issue.key, [issue.key for issue in feed.poll()])
+        self.assertNotIn(self.issue.key, [issue.key for issue in feed.poll()])
+
+        self.issue.update(summary='Changed for the change feed')
+        self.assertEqual([issue.key for issue in feed.poll()], [self.issue.key])
+        self.assertEqual(list(feed.poll()), [])
+
+    def test_poll_with_changes_during_poll(self):
+        issues = [self.issue] + [self.jira.create_issue(project={'key': 'BULK'}, issuetype={'name': 'Bug'},
+            summary='Test issue {0} for the change feed'.format(i)) for i in range(4)]
+        keys = [issue.key for issue in issues]
+        feed = ChangeFeed(self.jira, 'key in ({0})'.format(', '.join(keys)), pageSize=2)
+        polled = feed.poll()
+        first = next(polled)
+        # moves the first issue to the end of the results while the feed is between pages
+        issues[keys.index(first.key)].update(summary='Changed during the poll')
+        polled_keys = [first.key] + [issue.key for issue in polled]
+        self.assertEqual(sorted(set(polled_keys)), sorted(keys))
+        self.assertEqual(polled_keys.count(first.key), 2)
+        for issue in issues[1:]:
+            issue.delete()
+
+    def test_state_file(self):
+        state_dir = tempfile.mkdtemp()
+        state_path = os.path.join(state_dir, 'feed.json')
+        feed = ChangeFeed(self.jira, 'project=BULK', statePath=state_path, since=datetime.now() - timedelta(days=1))
+        list(feed.poll())
+
+        resumed = ChangeFeed(self.jira, 'project=BULK', statePath=state_path)
+        self.assertEqual(resumed.watermark, feed.watermark)
+        self.assertEqual(list(resumed.poll()), [])
+        os.remove(state_path)
+        os.rmdir(state_dir)
+
+    def test_rejects_order_by(self):
+        self.assertRaises(ValueError, ChangeFeed, self.jira, 'project=BULK order by created')
+
+
+class MirrorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.jira = get_jira_admin_auth()
+        self.state_dir = tempfile.mkdtemp()
+        self.mirror = Mirror(self.jira, os.path.join(self.state_dir, 'mirror.db'), 'project=BULK')
+
+    def tearDown(self):
+        self.mirror.close()
+        os.remove(self.mirror.path)
+        os.rmdir(self.state_dir)
+
+    def test_sync(self):
+        self.mirror.sync()
+        issue = self.mirror.issue('BULK-1')
+        self.assertEqual(issue.key, self.jira.issue('BULK-1').key)
+        self.assertEqual(issue.fields.summary, self.jira.issue('BULK-1').fields.summary)
+        self.assertEqual(len(self.mirror.issues(project='BULK')), self.jira.count_issues('project=BULK'))
+        self.assertEqual([comment.id for comment in self.mirror.comments('BULK-1')],
+                         [comment.id for comment in self.jira.comments('BULK-1')])
+        self.assertIsNone(self.mirror.issue('NOPE-1'))
+
+    def test_sync_uses_embedded_comments_and_worklogs(self):
+        fetched = []
+        comments, worklogs = self.jira.comments, self.jira.worklogs
+        self.jira.comments = lambda issue, raw=None: fetched.append(issue) or comments(issue, raw=raw)
+        self.jira.worklogs = lambda issue, raw=None: fetched.append(issue) or worklogs(issue, raw=raw)
+        count = self.mirror.sync()
+        # only issues whose comments or worklogs the search cut short are fetched one by one
+        self.assertLess(len(fetched), count)
+
+    def test_incremental_sync(self):
+        self.mirror.sync()
+        issue = self.jira.create_issue(project={'key': 'BULK'}, summary='Test issue for the mirror',
+            issuetype={'name': 'Bug'})
+        self.assertEqual(self.mirror.sync(), 1)
+        self.assertEqual(self.mirror.issue(issue.key).fields.summary, 'Test issue for the mirror')
+        issue.delete()
+
+
 class SecurityLevelTests(unittest.TestCase):
 
     def setUp(self):
@@ -14,10 +14,12 @@ import requests
 from jira.packages.requests_oauth.hook import OAuthHook
 from urlparse import parse_qsl
 import webbrowser
+from jira.cache import FileCache
 from jira.client import JIRA
 from jira import __version__
 
 CONFIG_PATH = os.path.join(os.path.expanduser('~'), '.jira-python', 'jirashell.ini')
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.jira-python', 'cache')
 
 def oauth_dance(server, consumer_key, key_cert_data, print_tokens=False):
     verify = server.startswith('https')
@@ -96,6 +98,9 @@ def process_command_line():
                             help='The root path of the REST API to use.')
     jira_group.add_argument('-v', '--rest-api-version',
                             help='The version of the API under the specified name.')
+    jira_group.add_argument('-c', '--cache-dir',
+                            help='The directory to cache metadata such as fields and statuses in between sessions.\
+                                  Defaults to ~/.jira-python/cache; pass an empty string to turn caching off.')
 
     basic_auth_group = parser.add_argument_group('BASIC auth options')
     basic_auth_group.add_argument('-u', '--username',
@@ -131,6 +136,8 @@ def process_command_line():
         options['rest_path'] = args.rest_path
     if args.rest_api_version:
         options['rest_api_version'] = args.rest_api_version
+    if args.cache_dir is not None:
+        options['cache_dir'] = args.cache_dir
 
     if args.prompt_for_password:
         args.password = getpass()
@@ -177,6 +184,10 @@ def main():
 
     options, basic_auth, oauth = get_config()
 
+    cache_dir = options.pop('cache_dir', CACHE_PATH)
+    if cache_dir:
+        options['cache'] = FileCache(cache_dir)
+
     jira = JIRA(options=options, basic_auth=basic_auth, oauth=oauth)
 
     from IPython.frontend.terminal.embed import InteractiveShellEmbed